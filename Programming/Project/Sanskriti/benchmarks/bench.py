@@ -0,0 +1,220 @@
+# bench.py
+# Hot-path benchmarks on seeded levels: A*, line of sight, guard perception
+# and full guard update ticks. Writes JSON so two commits can be compared:
+#   python benchmarks/bench.py --out before.json
+#   python benchmarks/bench.py --out after.json --compare before.json
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settings import GRID_W, GRID_H, TILE_SIZE, PATH_ENGINE, SHADOWCAST_FOV, LOS_TABLE, LOS_TABLE_RADIUS, SIM_DT
+from settings import PLAYER_HISTORY
+from mapgen import generate_level
+from pathfinding import astar, SearchStats
+from pathcache import PathService
+from flowfield import FlowField
+from guard import Guard, guards_see_player
+from utils import line_of_sight, from_grid, LosTable
+
+def scaled_level(seed, level, scale):
+    """generate_level on a grid scale times wider and taller than the default."""
+    grid, player_cell, runes, spawns = generate_level(seed=seed, level_number=level,
+                                                      width=GRID_W * scale, height=GRID_H * scale)
+    return grid, player_cell, spawns
+
+def summarize(samples_ns):
+    us = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    return {"n": int(len(us)),
+            "us_mean": round(float(us.mean()), 3),
+            "us_p50": round(float(np.percentile(us, 50)), 3),
+            "us_p99": round(float(np.percentile(us, 99)), 3)}
+
+def reachable_cells(grid, cell):
+    flow = FlowField(grid)
+    flow.build(cell)
+    return [(int(x), int(y)) for y, x in np.argwhere(grid == 0) if flow.reachable((int(x), int(y)))]
+
+def bench_astar(grid, cells, rng, queries):
+    pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(queries)]
+    astar(grid, *pairs[0])  # builds the per-grid search tables outside the timing
+    stats = SearchStats()
+    times, nodes, found = [], [], 0
+    for start, goal in pairs:
+        t0 = time.perf_counter_ns()
+        path = astar(grid, start, goal, stats=stats)
+        times.append(time.perf_counter_ns() - t0)
+        found += bool(path)
+        nodes.append(stats.expanded)
+    out = summarize(times)
+    out["found"] = found
+    out["nodes_mean"] = round(float(np.mean(nodes)), 1)
+    out["nodes_p99"] = round(float(np.percentile(nodes, 99)), 1)
+    return out
+
+def bench_los(grid, cells, rng, queries, radius=12):
+    pairs = []
+    while len(pairs) < queries:
+        a = rng.choice(cells)
+        b = (a[0] + rng.randint(-radius, radius), a[1] + rng.randint(-radius, radius))
+        if 0 <= b[0] < grid.shape[1] and 0 <= b[1] < grid.shape[0]:
+            pairs.append((a, b))
+    times = []
+    for a, b in pairs:
+        t0 = time.perf_counter_ns()
+        line_of_sight(grid, a, b)
+        times.append(time.perf_counter_ns() - t0)
+    return summarize(times)
+
+def make_guards(grid, spawns, level, los):
+    paths = PathService(grid)
+    flow = FlowField(grid)
+    guards = []
+    for sp in spawns:
+        g = Guard(sp, grid, paths=paths, flow=flow, los_table=los)
+        g.vision_distance += level * 0.5
+        g.speed = g.speed + level * 10
+        guards.append(g)
+    return guards, paths, flow
+
+def bench_can_see(grid, cells, spawns, level, los, rng, queries):
+    guards, _, _ = make_guards(grid, spawns, level, los)
+    times = []
+    for _ in range(queries // max(1, len(guards))):
+        player_cell = rng.choice(cells)
+        for g in guards:
+            g.heading = rng.uniform(0, 360)
+            t0 = time.perf_counter_ns()
+            g.can_see_player(player_cell)
+            times.append(time.perf_counter_ns() - t0)
+    return summarize(times)
+
+def bench_guard_ticks(grid, player_cell, spawns, level, los, rng, ticks):
+    """Whole-level guard ticks (batched perception + every guard's update)
+    against a player wandering the walkable region."""
+    guards, paths, flow = make_guards(grid, spawns, level, los)
+    cell, history, now = player_cell, deque(maxlen=PLAYER_HISTORY), 0.0
+    h, w = grid.shape
+    times = []
+    for _ in range(ticks):
+        x, y = cell[0] + rng.randint(-1, 1), cell[1] + rng.randint(-1, 1)
+        if 0 <= x < w and 0 <= y < h and grid[y, x] == 0:
+            cell = (x, y)
+        history.append(cell)
+        now += SIM_DT
+        t0 = time.perf_counter_ns()
+        paths.begin_frame()
+        flow.begin_frame()
+        seen = guards_see_player(guards, grid, cell, los)
+        for g, sees in zip(guards, seen):
+            g.update(SIM_DT, cell, from_grid(cell, TILE_SIZE), history, seen=bool(sees), now=now)
+        times.append(time.perf_counter_ns() - t0)
+    out = summarize(times)
+    out["guards"] = len(guards)
+    return out
+
+def run(seeds, levels, scales, queries, ticks):
+    results = {}
+    for level in levels:
+        for scale in scales:
+            rows = {"astar": [], "line_of_sight": [], "can_see_player": [], "guard_tick": []}
+            for seed in seeds:
+                rng = random.Random(seed * 1000 + level * 10 + scale)
+                grid, player_cell, spawns = scaled_level(seed, level, scale)
+                cells = reachable_cells(grid, player_cell)
+                los = LosTable(grid, LOS_TABLE_RADIUS) if LOS_TABLE else None
+                rows["astar"].append(bench_astar(grid, cells, rng, queries))
+                rows["line_of_sight"].append(bench_los(grid, cells, rng, queries * 10))
+                rows["can_see_player"].append(bench_can_see(grid, cells, spawns, level, los, rng, queries * 10))
+                rows["guard_tick"].append(bench_guard_ticks(grid, player_cell, spawns, level, los, rng, ticks))
+                print(f"level {level} x{scale} seed {seed}: "
+                      f"astar p50 {rows['astar'][-1]['us_p50']}us, guard tick p50 {rows['guard_tick'][-1]['us_p50']}us",
+                      file=sys.stderr)
+            for name, per_seed in rows.items():
+                # counts add up over the seeds, timings and node counts average
+                merged = {}
+                for key in per_seed[0]:
+                    values = [r[key] for r in per_seed if r[key] is not None]
+                    if key in ("n", "found"):
+                        merged[key] = sum(values)
+                    else:
+                        merged[key] = round(float(np.mean(values)), 3) if values else None
+                results[f"{name}/level{level}/x{scale}"] = merged
+    return results
+
+def best_of(runs):
+    """Fold repeated runs: the fastest timing per metric, everything else from
+    the first run (it is identical across runs)."""
+    results = runs[0]
+    for other in runs[1:]:
+        for key, row in results.items():
+            for metric, value in row.items():
+                if metric.startswith("us_"):
+                    row[metric] = min(value, other[key][metric])
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, baseline, threshold):
+    """Print p50 ratios against baseline; returns the keys slower than threshold."""
+    slower = []
+    for key, row in sorted(current["results"].items()):
+        base = baseline["results"].get(key)
+        if not base or not base.get("us_p50"):
+            continue
+        ratio = row["us_p50"] / base["us_p50"]
+        flag = "  SLOWER" if ratio > threshold else ""
+        print(f"{key:32s} {base['us_p50']:10.2f} -> {row['us_p50']:10.2f} us  x{ratio:.2f}{flag}")
+        if ratio > threshold:
+            slower.append(key)
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pathfinding and perception hot paths.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--queries", type=int, default=200, help="A* queries per level (x10 for LOS/perception)")
+    parser.add_argument("--ticks", type=int, default=300, help="guard update ticks per level")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, fastest kept")
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare p50 timings against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p50 ratio counted as a regression")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+                 "machine": platform.machine(), "path_engine": PATH_ENGINE, "shadowcast_fov": SHADOWCAST_FOV,
+                 "los_table": LOS_TABLE, "seeds": args.seeds, "levels": args.levels, "scales": args.scales,
+                 "queries": args.queries, "ticks": args.ticks, "repeat": args.repeat},
+        "results": best_of([run(args.seeds, args.levels, args.scales, args.queries, args.ticks)
+                            for _ in range(max(1, args.repeat))]),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
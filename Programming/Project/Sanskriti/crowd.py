@@ -0,0 +1,135 @@
+# crowd.py
+# Structure-of-arrays guards for crowd and stress levels. Positions, headings,
+# speeds, states and waypoints live in NumPy arrays and one step() moves every
+# guard at once, so hundreds of guards cost a handful of array ops per tick
+# instead of hundreds of Guard.update calls.
+# Rules are guard.Guard's for a regular guard with a one-cell patrol: chase
+# along the shared flow field while the player is seen, stand searching for a
+# few seconds after losing sight, otherwise walk back to the spawn cell.
+# Perception is the batch_can_see cone test (no shadowcast masks).
+import random
+
+import numpy as np
+
+from settings import TILE_SIZE, GUARD_VISION_DISTANCE, GUARD_FOV, GUARD_SPEED
+from flowfield import DIRS
+from guard import STATE_PATROL, STATE_CHASE, STATE_SEARCH
+from utils import batch_can_see
+
+# state codes, indexing NAMES
+PATROL, CHASE, SEARCH = 0, 1, 2
+NAMES = (STATE_PATROL, STATE_CHASE, STATE_SEARCH)
+
+SEARCH_TIME = 4.0  # seconds a guard keeps searching after losing sight (as Guard.update)
+ARRIVE_DIST = 3.0  # pixels from a waypoint's centre that count as reaching it (as Guard.follow_path)
+_DIRS = np.array(DIRS)
+
+class GuardCrowd:
+    def __init__(self, spawns, grid, paths, flow, los_table=None,
+                 vision=GUARD_VISION_DISTANCE, speed=GUARD_SPEED * TILE_SIZE):
+        n = len(spawns)
+        self.grid = grid
+        self.paths = paths  # PathService for the walk home
+        self.flow = flow  # FlowField toward the player, shared with the other guards
+        self.los_table = los_table
+        self.home = np.array(spawns, dtype=np.int64).reshape(-1, 2)
+        self.cell = self.home.copy()
+        self.x = (self.cell[:, 0] + 0.5) * TILE_SIZE
+        self.y = (self.cell[:, 1] + 0.5) * TILE_SIZE
+        # drawn from the global RNG like Guard's, so seeded levels stay reproducible
+        self.heading = np.array([random.uniform(0, 360) for _ in range(n)])
+        self.speed = np.full(n, float(speed))  # pixels per second
+        self.vision = np.full(n, float(vision))  # tiles
+        self.fov = np.full(n, float(GUARD_FOV))
+        self.state = np.full(n, PATROL, dtype=np.int8)
+        self.last_saw = np.full(n, -np.inf)
+        self.seen = np.zeros(n, dtype=bool)
+        # cell each guard is walking to, (-1, -1) when standing
+        self.waypoint = np.full((n, 2), -1, dtype=np.int64)
+        # route home: remaining cells per guard, position and length
+        self.routes = [None] * n
+        self.route_pos = np.zeros(n, dtype=np.int64)
+        self.route_len = np.zeros(n, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.x)
+
+    def see(self, player_cell):
+        self.seen = batch_can_see(self.grid, self.cell, np.column_stack((self.x, self.y)), self.heading,
+                                  self.fov, self.vision, player_cell, TILE_SIZE, self.los_table)
+        return self.seen
+
+    def step(self, dt, player_cell, now, seen=None):
+        """Perception, state transitions and movement for every guard.
+        Returns the visibility array."""
+        if seen is None:
+            seen = self.see(player_cell)
+        self.last_saw[seen] = now
+        state = np.where(seen, CHASE, np.where(now - self.last_saw < SEARCH_TIME, SEARCH, PATROL))
+        self.state = state.astype(np.int8)
+
+        chase = np.flatnonzero(state == CHASE)
+        if len(chase):
+            # one flow-field step per chaser, replacing any route home
+            self.flow.update(player_cell)
+            cells = self.cell[chase]
+            k = self.flow.best[cells[:, 1], cells[:, 0]]
+            self.waypoint[chase] = np.where((k >= 0)[:, None], cells + _DIRS[k], -1)
+            self.route_pos[chase] = 0
+            self.route_len[chase] = 0
+
+        # patrollers stop as soon as they are back in their spawn cell, and
+        # the ones standing elsewhere plan a route home
+        patrol = state == PATROL
+        at_home = (self.cell == self.home).all(axis=1)
+        back = patrol & at_home
+        self.waypoint[back] = -1
+        self.route_len[back] = 0
+        for i in np.flatnonzero(patrol & ~at_home & (self.waypoint[:, 0] < 0)):
+            self._route_home(i)
+
+        moving = np.flatnonzero((state != SEARCH) & (self.waypoint[:, 0] >= 0))
+        if len(moving):
+            self._move(moving, dt)
+        return seen
+
+    def _route_home(self, i):
+        path = self.paths.find(tuple(self.cell[i].tolist()), tuple(self.home[i].tolist()))
+        if path is None:
+            return  # replanning budget spent this frame: try again next tick
+        if len(path) > 1:
+            self.routes[i] = np.array(path[1:], dtype=np.int64)
+            self.route_pos[i] = 0
+            self.route_len[i] = len(path) - 1
+            self.waypoint[i] = self.routes[i][0]
+
+    def _move(self, idx, dt):
+        wp = self.waypoint[idx]
+        dx = (wp[:, 0] + 0.5) * TILE_SIZE - self.x[idx]
+        dy = (wp[:, 1] + 0.5) * TILE_SIZE - self.y[idx]
+        dist = np.hypot(dx, dy)
+        arrived = dist < ARRIVE_DIST
+
+        # walkers: integrate toward the waypoint and face the way they go
+        go = ~arrived
+        g, dx, dy, dist = idx[go], dx[go], dy[go], dist[go]
+        step = self.speed[g] * dt / dist
+        self.x[g] += dx * step
+        self.y[g] += dy * step
+        self.cell[g, 0] = self.x[g] // TILE_SIZE
+        self.cell[g, 1] = self.y[g] // TILE_SIZE
+        self.heading[g] = np.degrees(np.arctan2(dy, dx)) % 360
+
+        # arrivals take the waypoint's cell and move on along their route
+        done = idx[arrived]
+        if not len(done):
+            return
+        self.cell[done] = self.waypoint[done]
+        self.route_pos[done] += 1
+        more = self.route_pos[done] < self.route_len[done]
+        for i in done[more]:
+            self.waypoint[i] = self.routes[i][self.route_pos[i]]
+        self.waypoint[done[~more]] = -1
+
+    def states(self):
+        return [NAMES[s] for s in self.state]
@@ -0,0 +1,86 @@
+# flowfield.py
+import heapq
+import math
+
+import numpy as np
+
+from settings import DIAGONAL_COST, ORTHO_COST
+from pathfinding import grid_search, grid_changed
+
+# the 8 moves allowed by pathfinding.neighbors, as (dx, dy)
+DIRS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+COSTS = np.array([DIAGONAL_COST if dx and dy else ORTHO_COST for dx, dy in DIRS])
+
+class FlowField:
+    """Distance field from one goal cell (reverse Dijkstra over the level grid).
+    Built once per goal change; afterwards any number of guards look up
+    their next step toward the goal in O(1). Grid edits are picked up by
+    begin_frame(), once per frame, not on every lookup."""
+    def __init__(self, grid):
+        self.grid = grid
+        self.snapshot = None
+        self.goal = None
+        self.dist = None
+        self.best = None  # index into DIRS of the downhill move per cell, -1 if none
+
+    def _neighbour_stack(self, dist):
+        h, w = dist.shape
+        padded = np.pad(dist, 1, constant_values=np.inf)
+        # cand[k, y, x] = cost of reaching the goal through the k-th neighbour of (x, y)
+        return np.stack([padded[1+dy:1+dy+h, 1+dx:1+dx+w] for dx, dy in DIRS]) + COSTS[:, None, None]
+
+    def build(self, goal):
+        h, w = self.grid.shape
+        gx, gy = goal
+        flat = [math.inf] * (h * w)
+        if self.grid[gy, gx] == 0:
+            # one Dijkstra from the goal over the search engine's neighbour
+            # table; moves cost the same both ways, so this is every cell's
+            # distance to the goal
+            neighbors = grid_search(self.grid).neighbors
+            src = gy * w + gx
+            flat[src] = 0.0
+            heap = [(0.0, src)]
+            while heap:
+                d, i = heapq.heappop(heap)
+                if d > flat[i]:
+                    continue
+                for j, cost in neighbors[i]:
+                    nd = d + cost
+                    if nd < flat[j]:
+                        flat[j] = nd
+                        heapq.heappush(heap, (nd, j))
+        dist = np.array(flat).reshape(h, w)
+        cand = self._neighbour_stack(dist)
+        best = cand.argmin(axis=0)
+        best[~np.isfinite(cand.min(axis=0)) | ~np.isfinite(dist)] = -1
+        best[gy, gx] = -1
+        self.dist = dist
+        self.best = best
+        self.goal = goal
+        self.snapshot = self.grid.copy()
+
+    def begin_frame(self):
+        """Call once per frame: drops the field if the grid was edited."""
+        if self.snapshot is not None and not np.array_equal(self.grid, self.snapshot):
+            grid_changed(self.grid)
+            self.goal = None
+
+    def update(self, goal):
+        """Rebuild only when the goal cell moved (or begin_frame saw a grid edit)."""
+        if goal != self.goal:
+            self.build(goal)
+
+    def reachable(self, cell):
+        return bool(np.isfinite(self.dist[cell[1], cell[0]]))
+
+    def next_cell(self, cell, goal=None):
+        """Next cell on a shortest path from cell to the goal, or None."""
+        if goal is not None:
+            self.update(goal)
+        x, y = cell
+        k = self.best[y, x]
+        if k < 0:
+            return None
+        dx, dy = DIRS[k]
+        return (x + dx, y + dy)
@@ -2,10 +2,12 @@
 import math
 import random
 import time
+from collections import deque
 
-import pygame
+import numpy as np
 from settings import TILE_SIZE, GUARD_VISION_DISTANCE, GUARD_FOV, GUARD_SPEED, GUARD_HEARING_RADIUS
-from utils import from_grid, to_grid, angle_between, angle_diff, distance, line_of_sight
+from settings import SHADOWCAST_FOV, GUARD_MEMORY
+from utils import from_grid, to_grid, angle_between, angle_diff, distance, line_of_sight, batch_can_see, shadowcast_fov
 from pathfinding import astar
 
 # State constants
@@ -16,10 +18,33 @@ STATE_SEARCH = "search"
 STATE_IDLE = "idle"
 STATE_BOSS = "boss"
 
+def guards_see_player(guards, grid, player_cell, los=None):
+    """Visibility of the player for every guard, computed in one NumPy pass."""
+    if SHADOWCAST_FOV:
+        # range and angle first; the cached masks only for the guards that pass
+        return np.array([g.can_see_player(player_cell) for g in guards], dtype=bool)
+    return batch_can_see(grid,
+                         [g.cell for g in guards],
+                         [(g.x, g.y) for g in guards],
+                         [g.heading for g in guards],
+                         [g.fov for g in guards],
+                         [g.vision_distance for g in guards],
+                         player_cell, TILE_SIZE, los)
+
 class Guard:
-    def __init__(self, start_cell, grid, patrol=None, is_boss=False):
+    __slots__ = ("cell", "grid", "paths", "flow", "los_table", "x", "y", "radius", "speed", "vision_distance",
+                 "fov", "heading", "state", "patrol", "patrol_index", "path", "path_index", "path_goal", "is_boss",
+                 "player_memory", "last_saw_time", "now", "search_timer", "fov_mask", "fov_mask_key")
+
+    def __init__(self, start_cell, grid, patrol=None, is_boss=False, paths=None, flow=None, los_table=None):
         self.cell = start_cell
         self.grid = grid
+        # shared per-level PathService; None falls back to a direct astar() call
+        self.paths = paths
+        # shared FlowField toward the player; None falls back to per-guard A*
+        self.flow = flow
+        # precomputed utils.LosTable for the level; None uses line_of_sight directly
+        self.los_table = los_table
         self.x, self.y = from_grid(start_cell, TILE_SIZE)
         self.radius = TILE_SIZE * 0.35
         self.speed = GUARD_SPEED * TILE_SIZE  # pixels per second
@@ -29,13 +54,40 @@ class Guard:
         self.state = STATE_PATROL
         self.patrol = patrol or [start_cell]
         self.patrol_index = 0
-        self.path = []
+        # cells to walk, shared with the path cache and never copied;
+        # path_index is the next one to head for
+        self.path = ()
         self.path_index = 0
+        self.path_goal = None
         self.is_boss = is_boss
         # memory of recent player positions to mimic learning
-        self.player_memory = []
+        self.player_memory = deque(maxlen=GUARD_MEMORY)
         self.last_saw_time = None
+        self.now = 0.0  # simulation time of the current update, in seconds
         self.search_timer = 0
+        self.fov_mask = None
+        self.fov_mask_key = None
+
+    def vision_mask(self):
+        """Shadowcast visible-cell mask, all the way round, for the current cell.
+        Heading and FOV are not baked in, so turning never rebuilds it; the
+        exact cone test is applied on top (can_see_player, cone_cells)."""
+        key = (self.cell, round(self.vision_distance, 1))
+        if key != self.fov_mask_key:
+            self.fov_mask = shadowcast_fov(self.grid, self.cell, self.vision_distance)
+            self.fov_mask_key = key
+        return self.fov_mask
+
+    def cone_cells(self):
+        """(y, x) rows of the floor cells the guard can see right now: the
+        mask clipped by the same range and angle test as can_see_player."""
+        cx, cy = self.cell
+        ys, xs = np.nonzero(self.vision_mask() & (self.grid == 0))
+        near = np.hypot(xs - cx, ys - cy) <= self.vision_distance
+        ang = np.degrees(np.arctan2((ys + 0.5) * TILE_SIZE - self.y, (xs + 0.5) * TILE_SIZE - self.x)) % 360
+        inside = np.abs((ang - self.heading + 180) % 360 - 180) <= self.fov / 2
+        keep = near & inside
+        return np.column_stack((ys[keep], xs[keep]))
 
     def can_see_player(self, player_cell):
         # distance check
@@ -52,7 +104,13 @@ class Guard:
         if angle_diff(ang, self.heading) > self.fov / 2:
             return False
         # line of sight check on grid
-        if not line_of_sight(self.grid, self.cell, player_cell):
+        if SHADOWCAST_FOV:
+            if not self.vision_mask()[player_cell[1], player_cell[0]]:
+                return False
+        elif self.los_table is not None:
+            if not self.los_table.visible(self.cell, player_cell):
+                return False
+        elif not line_of_sight(self.grid, self.cell, player_cell):
             return False
         return True
 
@@ -63,15 +121,29 @@ class Guard:
         world_t = (tx * TILE_SIZE + TILE_SIZE*0.5, ty * TILE_SIZE + TILE_SIZE*0.5)
         self.heading = angle_between(world_g, world_t)
 
-    def set_path_to(self, target_cell):
-        path = astar(self.grid, self.cell, target_cell)
+    def set_path_to(self, target_cell, partial=False):
+        """partial: when the search gives up, walk toward the closest cell it reached."""
+        if self.paths is not None:
+            path = self.paths.find(self.cell, target_cell, partial=partial)
+            if path is None:
+                # replanning budget spent this frame: keep the current path
+                return
+        else:
+            path = astar(self.grid, self.cell, target_cell, partial=partial)
+        self.path_goal = target_cell
         if path and len(path) > 1:
-            self.path = path[1:]
-            self.path_index = 0
+            # path[0] is the cell the guard stands on
+            self.path = path
+            self.path_index = 1
         else:
-            self.path = []
+            self.path = ()
             self.path_index = 0
 
+    def replan_to(self, target_cell, partial=False):
+        """Only search again when the goal cell moved or the path ran out."""
+        if target_cell != self.path_goal or not self.path:
+            self.set_path_to(target_cell, partial)
+
     def patrol_behavior(self, dt):
         if not self.patrol:
             self.state = STATE_IDLE
@@ -99,7 +171,7 @@ class Guard:
             self.cell = next_cell
             self.path_index += 1
             if self.path_index >= len(self.path):
-                self.path = []
+                self.path = ()
                 self.path_index = 0
             return
         vx = dx / dist * self.speed
@@ -109,9 +181,19 @@ class Guard:
         self.cell = to_grid((self.x, self.y), TILE_SIZE)
         self.heading = math.degrees(math.atan2(dy, dx)) % 360
 
+    def step_toward_player(self, player_cell):
+        """Take the next cell from the shared flow field instead of searching."""
+        step = self.flow.next_cell(self.cell, player_cell)
+        self.path = (step,) if step else ()
+        self.path_index = 0
+        self.path_goal = player_cell
+
     def chase_behavior(self, player_cell, dt):
-        # chasing uses A* to player cell
-        self.set_path_to(player_cell)
+        if self.flow is not None:
+            self.step_toward_player(player_cell)
+        else:
+            # chasing uses A* to player cell; a capped search still closes in
+            self.replan_to(player_cell, partial=True)
         self.follow_path(dt)
 
     def search_behavior(self, dt):
@@ -129,8 +211,6 @@ class Guard:
         # update memory
         if player_cell:
             self.player_memory.append(player_cell)
-            if len(self.player_memory) > 8:
-                self.player_memory.pop(0)
         # predict next cell
         pred = player_cell
         if len(self.player_memory) >= 3:
@@ -145,30 +225,48 @@ class Guard:
                     max(0, min(pred[1], self.grid.shape[0]-1)))
         # choose intercept: try predicted pos, else player pos
         intercept = pred
-        self.set_path_to(intercept)
-        # If path is empty, fallback to player's cell
-        if not self.path:
-            self.set_path_to(player_cell)
+        if self.flow is not None:
+            # the flow field already knows whether the intercept cell connects to the player
+            self.flow.update(player_cell)
+            if intercept != player_cell and self.flow.reachable(intercept):
+                self.replan_to(intercept)
+            if intercept == player_cell or not self.path:
+                self.step_toward_player(player_cell)
+        else:
+            # an intercept inside a wall or a cut-off pocket is turned down without a search
+            self.replan_to(intercept)
+            # If path is empty, fallback to player's cell
+            if not self.path:
+                self.replan_to(player_cell, partial=True)
         self.follow_path(dt)
         # adapt vision slightly when repeatedly failing to see player
-        if self.last_saw_time is None or (time.time() - self.last_saw_time) > 5:
+        if self.last_saw_time is None or (self.now - self.last_saw_time) > 5:
             self.vision_distance = min(self.vision_distance + 0.01, self.grid.shape[0] // 2)
         else:
             # grew confidence
             self.vision_distance = max(3, self.vision_distance - 0.05)
 
-    def update(self, dt, player_cell, player_world_pos, player_history):
-        # perception
-        seen = self.can_see_player(player_cell)
+    def update(self, dt, player_cell, player_world_pos, player_history, seen=None, now=None, think=True):
+        # now: simulation clock in seconds (sim.Simulation passes its own);
+        # falls back to the wall clock for standalone use
+        self.now = time.monotonic() if now is None else now
+        if not think:
+            # skipped by the AI scheduler (lod.py): keep walking, decide nothing
+            if self.state != STATE_SEARCH:
+                self.follow_path(dt)
+            return
+        # perception (precomputed for all guards by guards_see_player when given)
+        if seen is None:
+            seen = self.can_see_player(player_cell)
         if seen:
-            self.last_saw_time = pygame.time.get_ticks() / 1000.0
+            self.last_saw_time = self.now
             if self.is_boss:
                 self.state = STATE_BOSS
             else:
                 self.state = STATE_CHASE
         else:
             # if recently saw, search for a bit
-            if self.last_saw_time and (pygame.time.get_ticks()/1000.0 - self.last_saw_time) < 4:
+            if self.last_saw_time is not None and (self.now - self.last_saw_time) < 4:
                 self.state = STATE_SEARCH
                 self.search_timer = 3.0
             else:
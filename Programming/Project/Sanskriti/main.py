@@ -1,21 +1,22 @@
 # main.py
 import sys
-import random
 import pygame
 import numpy as np
 import time
 
-from settings import WIDTH, HEIGHT, FPS, CAPTION, TILE_SIZE, GRID_W, GRID_H, RUNE_SCORE, LEVEL_COUNT
-from mapgen import generate_level
-from player import Player
-from guard import Guard
-from ui import draw_hud, draw_text, BIG
-from utils import from_grid, to_grid, line_of_sight
+from settings import WIDTH, HEIGHT, FPS, CAPTION, TILE_SIZE, LEVEL_COUNT, SHADOWCAST_FOV, DIRTY_RECTS, SIM_DT
+from settings import MAX_FRAME_DT, MAX_SIM_STEPS
+from player import Inputs
+from sim import Simulation
+from ui import draw_hud, draw_text, BIG, PerfOverlay
+import perf
 
 pygame.init()
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption(CAPTION)
 clock = pygame.time.Clock()
+overlay = PerfOverlay()
+overlay.visible = perf.enabled
 
 def draw_grid(screen, grid):
     h, w = grid.shape
@@ -30,22 +31,116 @@ def draw_grid(screen, grid):
     # for x in range(w):
     #     pygame.draw.line(screen, (20,20,20), (x*TILE_SIZE, 0), (x*TILE_SIZE, HEIGHT))
 
-def render_player(screen, player):
-    pygame.draw.circle(screen, (40,200,80), (int(player.x), int(player.y)), int(player.radius))
+class GridBackground:
+    """The static level (clear colour + tiles) baked into one Surface at level
+    build; each frame is a single blit. Re-bakes if the grid is modified."""
+    def __init__(self, grid):
+        self.surface = None
+        self.snapshot = None
+        self.bake(grid)
+
+    def bake(self, grid):
+        self.surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+        self.surface.fill((6,6,6))
+        draw_grid(self.surface, grid)
+        self.snapshot = grid.copy()
+
+    def draw(self, screen, grid):
+        if not np.array_equal(grid, self.snapshot):
+            self.bake(grid)
+        screen.blit(self.surface, (0,0))
+
+    def restore(self, screen, grid, rects):
+        """Put the background back under rects only. Returns False after a full
+        redraw instead, when the grid changed."""
+        if not np.array_equal(grid, self.snapshot):
+            self.draw(screen, grid)
+            return False
+        for rect in rects:
+            screen.blit(self.surface, rect, area=rect)
+        return True
+
+class DirtyRects:
+    """Opt-in dirty-rectangle presentation (settings.DIRTY_RECTS): restores the
+    background under last frame's dynamic regions and pushes only last frame's
+    plus this frame's regions to the display."""
+    def __init__(self):
+        self.previous = None  # None forces a full redraw + flip
+
+    def begin(self, screen, background, grid):
+        if self.previous is None or not background.restore(screen, grid, self.previous):
+            background.draw(screen, grid)
+            self.previous = None
+
+    def present(self, rects):
+        if self.previous is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + rects)
+        self.previous = rects
+
+def render_player(screen, player, pos):
+    return pygame.draw.circle(screen, (40,200,80), (int(pos[0]), int(pos[1])), int(player.radius))
 
 def render_runes(screen, runes):
+    rects = []
     for (rx, ry) in runes:
         cx = int(rx * TILE_SIZE + TILE_SIZE*0.5)
         cy = int(ry * TILE_SIZE + TILE_SIZE*0.5)
-        pygame.draw.circle(screen, (230,200,60), (cx, cy), int(TILE_SIZE*0.25))
+        rects.append(pygame.draw.circle(screen, (230,200,60), (cx, cy), int(TILE_SIZE*0.25)))
         # little glow
         pygame.draw.circle(screen, (255, 255, 200), (cx, cy), int(TILE_SIZE*0.12))
+    return rects
 
-def render_guard(screen, guard):
-    color = (200,50,50) if not guard.is_boss else (150,30,180)
-    pygame.draw.circle(screen, color, (int(guard.x), int(guard.y)), int(guard.radius))
+class ConeLayer:
+    """One preallocated SRCALPHA overlay shared by every guard's vision cone.
+    Each frame only the regions drawn last frame are cleared and only the
+    regions drawn this frame are blitted."""
+    def __init__(self):
+        self.surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        self.dirty = []
+
+    def begin(self):
+        for rect in self.dirty:
+            self.surface.fill((0, 0, 0, 0), rect)
+        self.dirty = []
+
+    def add(self, rect):
+        # merge overlapping regions so no overlay pixel is blended twice
+        rect = pygame.Rect(rect).clip(self.surface.get_rect())
+        if not rect.w or not rect.h:
+            return
+        merged = True
+        while merged:
+            merged = False
+            for other in self.dirty:
+                if rect.colliderect(other):
+                    self.dirty.remove(other)
+                    rect.union_ip(other)
+                    merged = True
+                    break
+        self.dirty.append(rect)
+
+    def blit(self, screen):
+        for rect in self.dirty:
+            screen.blit(self.surface, rect, area=rect)
+
+def render_cone(cones, guard, pos):
+    color = (200, 200, 80, 40)
+    if SHADOWCAST_FOV:
+        # vision cone - the cells the guard can actually see, walls occlude;
+        # shifted by however far the drawn body is from the simulated one
+        ox, oy = int(pos[0] - guard.x), int(pos[1] - guard.y)
+        cells = guard.cone_cells()
+        if not len(cells):
+            return
+        for y, x in cells:
+            cones.surface.fill(color, (x*TILE_SIZE + ox, y*TILE_SIZE + oy, TILE_SIZE, TILE_SIZE))
+        (y0, x0), (y1, x1) = cells.min(axis=0), cells.max(axis=0)
+        cones.add((x0*TILE_SIZE + ox, y0*TILE_SIZE + oy, (x1-x0+1)*TILE_SIZE, (y1-y0+1)*TILE_SIZE))
+        return
     # vision cone - simplistic polygon
-    center = (guard.x, guard.y)
+    center = (float(pos[0]), float(pos[1]))
     pts = []
     deg = guard.fov / 2
     for angle in (-deg, deg):
@@ -54,64 +149,47 @@ def render_guard(screen, guard):
         dy = math.sin(a) * guard.vision_distance * TILE_SIZE
         pts.append((int(center[0] + dx), int(center[1] + dy)))
     pts = [center] + pts
-    s = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    pygame.draw.polygon(s, (200, 200, 80, 40), pts)
-    screen.blit(s, (0,0))
+    cones.add(pygame.draw.polygon(cones.surface, color, pts))
+
+def render_guard(screen, guard, pos):
+    color = (200,50,50) if not guard.is_boss else (150,30,180)
+    return pygame.draw.circle(screen, color, (int(pos[0]), int(pos[1])), int(guard.radius))
+
+def render_crowd(screen, positions):
+    radius = int(TILE_SIZE * 0.35)
+    return [pygame.draw.circle(screen, (200,50,50), (int(x), int(y)), radius)
+            for x, y in positions.tolist()]
 
 import math
 
+def read_inputs():
+    keys = pygame.key.get_pressed()
+    move_x = (keys[pygame.K_d] or keys[pygame.K_RIGHT]) - (keys[pygame.K_a] or keys[pygame.K_LEFT])
+    move_y = (keys[pygame.K_s] or keys[pygame.K_DOWN]) - (keys[pygame.K_w] or keys[pygame.K_UP])
+    return Inputs(move_x, move_y, bool(keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]))
+
 def run_game():
     level_num = 1
     total_score = 0
     random_seed = int(time.time())
     while level_num <= LEVEL_COUNT:
-        # generate level
+        # level setup and game rules live in sim.Simulation; this loop only
+        # feeds it input and draws its state
         seed = random_seed + level_num * 13
-        grid, player_cell, runes, guard_spawns = generate_level(seed=seed, level_number=level_num)
-        # add extra runes so player has to collect several
-        random.shuffle(runes)
-        runes_set = list(runes)
-        # ensure at least 3 runes
-        while len(runes_set) < 3:
-            # find random floor cell
-            h, w = grid.shape
-            rx = random.randint(1, w-2)
-            ry = random.randint(1, h-2)
-            if grid[ry, rx] == 0 and (rx, ry) != player_cell:
-                runes_set.append((rx, ry))
-        player = Player(player_cell)
-        guards = []
-        # difficulty scaling
-        for i, sp in enumerate(guard_spawns):
-            is_boss = False
-            g = Guard(sp, grid, patrol=None, is_boss=False)
-            # increase guard vision/distance by level slightly
-            g.vision_distance += level_num * 0.5
-            g.speed = g.speed + level_num * 10
-            guards.append(g)
-
-        # final boss on last level
-        if level_num == LEVEL_COUNT:
-            # place boss near last room or random
-            placed = False
-            for y in range(grid.shape[0]):
-                for x in range(grid.shape[1]):
-                    if grid[y, x] == 0:
-                        boss = Guard((x, y), grid, is_boss=True)
-                        boss.vision_distance += 3
-                        boss.fov += 20
-                        guards.append(boss)
-                        placed = True
-                        break
-                if placed:
-                    break
+        sim = Simulation(seed, level_num)
+        grid, player, guards = sim.grid, sim.player, sim.guards
+        background = GridBackground(grid)
+        cones = ConeLayer()
+        dirty = DirtyRects()
+        # fixed-timestep clock: real time piles up in acc and is spent in
+        # SIM_DT steps; drawing blends the last two step states by the rest
+        acc = 0.0
+        prev = cur = sim.positions()
 
         level_running = True
         level_complete = False
-        lore_shown = False
-        player_history = []  # store recent player cells for guards
         while level_running:
-            dt = clock.tick(FPS) / 1000.0
+            acc += min(clock.tick(FPS) / 1000.0, MAX_FRAME_DT)
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -120,26 +198,25 @@ def run_game():
                     if event.key == pygame.K_ESCAPE:
                         pygame.quit()
                         sys.exit()
+                    if event.key == pygame.K_F3:
+                        overlay.toggle()
+                    if event.key == pygame.K_F4 and perf.enabled:
+                        print("trace written to", perf.dump())
 
             # update
-            player.update(dt, grid)
-            player_history.append(player.cell)
-            if len(player_history) > 20:
-                player_history.pop(0)
-
-            # rune collection
-            for rune in runes_set[:]:
-                if player.cell == rune:
-                    player.score += RUNE_SCORE
-                    runes_set.remove(rune)
-
-            # guards update
-            for g in guards:
-                g.update(dt, player.cell, (player.x, player.y), player_history)
-                # if guard sees player and close -> caught
-                if g.can_see_player(player.cell):
-                    if math.hypot(g.x - player.x, g.y - player.y) < TILE_SIZE * 0.8:
-                        player.alive = False
+            inputs = read_inputs()
+            steps = 0
+            while acc >= SIM_DT and steps < MAX_SIM_STEPS and not sim.over:
+                prev = cur
+                with perf.scope("sim.step"):
+                    sim.step(inputs, SIM_DT)
+                cur = sim.positions()
+                acc -= SIM_DT
+                steps += 1
+            if steps == MAX_SIM_STEPS:
+                # too far behind to catch up: drop the backlog rather than spiral
+                acc = min(acc, SIM_DT)
+            view = prev + (cur - prev) * (acc / SIM_DT)
 
             # check death
             if not player.alive:
@@ -160,21 +237,38 @@ def run_game():
                 break
 
             # check win condition: all runes collected
-            if not runes_set:
+            if sim.complete:
                 level_complete = True
                 total_score += player.score
                 level_running = False
 
             # rendering
-            screen.fill((6,6,6))
-            draw_grid(screen, grid)
-            render_runes(screen, runes_set)
-            for g in guards:
-                render_guard(screen, g)
-            render_player(screen, player)
-            draw_hud(screen, player, level_num)
+            with perf.scope("render"):
+                if DIRTY_RECTS:
+                    dirty.begin(screen, background, grid)
+                else:
+                    background.draw(screen, grid)
+                rects = render_runes(screen, sim.runes)
+                with perf.scope("render.cones"):
+                    cones.begin()
+                    for g, pos in zip(guards, view[1:]):
+                        render_cone(cones, g, pos)
+                    cones.blit(screen)
+                rects += cones.dirty
+                for g, pos in zip(guards, view[1:]):
+                    rects.append(render_guard(screen, g, pos))
+                if sim.crowd is not None:
+                    rects += render_crowd(screen, view[1 + len(guards):])
+                rects.append(render_player(screen, player, view[0]))
+                rects += draw_hud(screen, player, level_num)
+                rects += overlay.draw(screen)
 
-            pygame.display.flip()
+            with perf.scope("flip"):
+                if DIRTY_RECTS:
+                    dirty.present(rects)
+                else:
+                    pygame.display.flip()
+            perf.end_frame()
 
         # level end: show lore text
         if level_complete:
@@ -0,0 +1,59 @@
+# pathcache.py
+from collections import OrderedDict
+
+import numpy as np
+
+from settings import PATH_CACHE_SIZE, PATH_REPLAN_BUDGET
+from pathfinding import astar, SearchStats, grid_changed
+
+class PathService:
+    """Level-scoped front for A*: memoizes (start, goal) results with LRU eviction,
+    drops everything when the grid changes and caps fresh searches per frame."""
+    def __init__(self, grid, max_entries=PATH_CACHE_SIZE, budget=PATH_REPLAN_BUDGET, search=astar):
+        self.grid = grid
+        self.search = search
+        self.max_entries = max_entries
+        self.budget = budget
+        self.cache = OrderedDict()
+        self.snapshot = grid.copy()
+        self.searches_left = budget
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # goals turned down without a search
+        self.last_stats = None  # SearchStats of the latest fresh search
+
+    def invalidate(self):
+        self.cache.clear()
+        self.snapshot = self.grid.copy()
+        grid_changed(self.grid)
+
+    def begin_frame(self):
+        """Call once per frame: refills the search budget and drops stale paths."""
+        self.searches_left = self.budget
+        if not np.array_equal(self.grid, self.snapshot):
+            self.invalidate()
+
+    def find(self, start, goal, force=False, partial=False):
+        """Return a path tuple (possibly empty), or None when this frame's
+        search budget is spent and the query has to wait for the next one.
+        partial is passed on to the search (see astar)."""
+        key = (start, goal, partial)
+        path = self.cache.get(key)
+        if path is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return path
+        if self.searches_left <= 0 and not force:
+            return None
+        self.searches_left -= 1
+        self.misses += 1
+        stats = self.last_stats = SearchStats()
+        path = tuple(self.search(self.grid, start, goal, partial=partial, stats=stats))
+        if stats.rejected and not stats.expanded:
+            # turned down up front: cost nothing, so it does not use up the budget
+            self.rejected += 1
+            self.searches_left += 1
+        self.cache[key] = path
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return path
@@ -1,10 +1,17 @@
 # player.py
-import pygame
+from collections import namedtuple
+
 from settings import TILE_SIZE, PLAYER_MAX_STAMINA, PLAYER_STAMINA_DRAIN, PLAYER_STAMINA_RECOVER, PLAYER_SPRINT_MULT
 from utils import from_grid, to_grid, clamp
 import math
 
+# one tick of player input: move_x/move_y in -1..1, sprint held
+Inputs = namedtuple("Inputs", "move_x move_y sprint")
+IDLE = Inputs(0, 0, False)
+
 class Player:
+    __slots__ = ("cell", "tile_size", "x", "y", "radius", "speed", "sprinting", "stamina", "score", "alive")
+
     def __init__(self, start_cell, tile_size=TILE_SIZE):
         self.cell = start_cell
         self.tile_size = tile_size
@@ -17,28 +24,16 @@ class Player:
         self.alive = True
 
     def rect(self):
+        import pygame
         return pygame.Rect(self.x - self.radius, self.y - self.radius,
                            self.radius * 2, self.radius * 2)
 
-    def update(self, dt, grid):
-        keys = pygame.key.get_pressed()
-        vx = vy = 0.0
-        move = False
-
-        if keys[pygame.K_w] or keys[pygame.K_UP]:
-            vy -= 1
-            move = True
-        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-            vy += 1
-            move = True
-        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-            vx -= 1
-            move = True
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-            vx += 1
-            move = True
+    def update(self, dt, grid, inputs=IDLE):
+        vx = float(inputs.move_x)
+        vy = float(inputs.move_y)
+        move = vx != 0 or vy != 0
 
-        self.sprinting = keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]
+        self.sprinting = bool(inputs.sprint)
 
         if self.sprinting and self.stamina <= 0:
             self.sprinting = False
@@ -1,12 +1,16 @@
 # settings.py
 # Game configuration and constants
 
-import pygame
+import os
 
 # Window
 WIDTH, HEIGHT = 960, 720
 FPS = 60
+DIRTY_RECTS = False  # redraw/present only changed regions instead of full flips
 CAPTION = "Sanskriti: The Lost Scripts"
+SIM_DT = 1.0 / FPS  # fixed simulation step in seconds
+MAX_FRAME_DT = 0.25  # seconds; longer frames (hitches, window drags) are clamped to this
+MAX_SIM_STEPS = 5  # sim steps per rendered frame at most; any backlog beyond is dropped
 
 # Grid
 TILE_SIZE = 32
@@ -37,10 +41,43 @@ GUARD_SPEED = 1.4
 GUARD_VISION_DISTANCE = 6  # in tiles (short for stealth)
 GUARD_FOV = 70  # degrees
 GUARD_HEARING_RADIUS = 3  # tiles for cautious reaction
+GUARD_MEMORY = 8  # recent player cells a boss remembers for its prediction
+PLAYER_HISTORY = 20  # recent player cells handed to the guards each tick
+SPAWN_CLEARANCE = 6  # tiles around the player start kept free of extra (stress) guards
+
+# Guard perception
+SHADOWCAST_FOV = True  # line of sight + occluded cone drawing from a shadowcast mask cached per guard cell
+
+# Guard AI level of detail (see lod.py)
+AI_LOD = True  # calm guards away from the player think at a reduced rate
+AI_NEAR_RADIUS = 10  # tiles; keep above the largest regular guard vision so skipped guards couldn't see anyway
+AI_FAR_INTERVAL = 4  # ticks between thinks for the other guards
 
 # Pathfinding
 DIAGONAL_COST = 1.4
 ORTHO_COST = 1.0
+PATH_CACHE_SIZE = 256  # memoized (start, goal) paths per level
+PATH_REPLAN_BUDGET = 4  # fresh A* searches allowed per frame
+PATH_ENGINE = "array"  # "array" (flat-index A*), "jps" (jump point search) or "dict" (original A*)
+HIERARCHICAL_PATHS = False  # plan guard routes room-to-room over mapgen's RoomGraph
+GUARD_CROWD = False  # run regular guards as one vectorized crowd.GuardCrowd (cone perception, no cones drawn)
+
+# Line of sight
+LOS_TABLE = True  # precompute cell-to-cell LOS bitsets at level load
+LOS_TABLE_RADIUS = 12  # tiles; farther pairs fall back to line_of_sight
+# directory for LOS tables on disk, keyed by seed+level; only pays off when
+# seeds repeat (sim.py --los-cache, benchmarks), so play leaves it off (None)
+LOS_CACHE_DIR = None
+LOS_CACHE_ENTRIES = 32  # tables kept on disk; least recently used go first
+
+# Profiling (F3 toggles the overlay, F4 dumps a trace)
+PROFILE = False  # start with timing scopes enabled
+PROFILE_FRAMES = 300  # rolling window of frames kept for the overlay and dumps
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# Proximity queries
+SPATIAL_BUCKET = 4  # side of a spatial hash bucket, in tiles
+CATCH_RADIUS = TILE_SIZE * 0.8  # a guard that sees the player this close catches them
 
 # Levels
 LEVEL_COUNT = 5
@@ -50,3 +87,4 @@ RUNE_SCORE = 100
 
 # Misc
 FONT_NAME = None  # default pygame font
+TEXT_CACHE_SIZE = 128  # rendered text surfaces kept by ui.render_text
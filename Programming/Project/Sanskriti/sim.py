@@ -0,0 +1,219 @@
+# sim.py
+# Engine-free game core: one level's grid, player, guards and runes advanced
+# by a fixed-timestep step(). No pygame import - main.py renders it, and it
+# runs headless for batch tests, AI tuning and benchmarks.
+# The Ursina build (Sanskriti1) drives the same kind of core, sim3d.py, with
+# its own rules and world units.
+import math
+import os
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from settings import TILE_SIZE, RUNE_SCORE, LEVEL_COUNT, HIERARCHICAL_PATHS, SIM_DT, CATCH_RADIUS, PLAYER_HISTORY
+from settings import LOS_TABLE, LOS_TABLE_RADIUS, LOS_CACHE_DIR, LOS_CACHE_ENTRIES, GUARD_CROWD, GUARD_VISION_DISTANCE, GUARD_SPEED
+from settings import SPAWN_CLEARANCE
+from mapgen import generate_level, label_components
+from player import Player, Inputs, IDLE
+from guard import Guard, guards_see_player, STATE_PATROL
+from crowd import GuardCrowd
+from pathcache import PathService
+from flowfield import FlowField
+from hpa import HierarchicalPlanner
+from spatial import SpatialHash
+from lod import AIScheduler
+from utils import LosTable
+import perf
+
+class Simulation:
+    """A single level. Same seed + same input sequence -> same state, tick for
+    tick: the clock is the tick count, never the wall clock.
+    crowd runs the regular guards as one GuardCrowd; extra_guards adds that
+    many more on random reachable cells clear of the player start, for stress
+    runs."""
+    __slots__ = ("seed", "level_num", "grid", "runes", "player", "paths", "flow", "los", "guards", "crowd",
+                 "guard_index", "catch_cells", "ai", "player_history", "seen", "tick", "time", "complete")
+
+    def __init__(self, seed, level_num=1, los_cache_dir=LOS_CACHE_DIR, crowd=GUARD_CROWD, extra_guards=0):
+        self.seed = seed
+        self.level_num = level_num
+        # generate_level seeds the global RNG; guard headings and the extra
+        # runes below draw from it, so they follow the seed too
+        grid, player_cell, runes, guard_spawns, room_graph = generate_level(seed=seed, level_number=level_num,
+                                                                            with_graph=True)
+        self.grid = grid
+        # add extra runes so player has to collect several
+        random.shuffle(runes)
+        self.runes = set(runes)  # uncollected rune cells
+        # ensure at least 3 runes, each one the player can walk to
+        h, w = grid.shape
+        labels, _ = label_components(grid)
+        home = labels[player_cell[1], player_cell[0]]
+        while len(self.runes) < 3:
+            # find random reachable cell
+            rx = random.randint(1, w-2)
+            ry = random.randint(1, h-2)
+            if labels[ry, rx] == home and (rx, ry) != player_cell:
+                self.runes.add((rx, ry))
+        self.player = Player(player_cell)
+        if HIERARCHICAL_PATHS:
+            self.paths = PathService(grid, search=HierarchicalPlanner(room_graph).find_path)
+        else:
+            self.paths = PathService(grid)
+        self.flow = FlowField(grid)
+        if LOS_TABLE:
+            self.los = LosTable.load_or_build(grid, seed, level_num, LOS_TABLE_RADIUS, los_cache_dir, LOS_CACHE_ENTRIES)
+        else:
+            self.los = None
+        if extra_guards:
+            # reachable floor, away from the player start, runes and the other guards
+            free = labels == home
+            px, py = player_cell
+            r = SPAWN_CLEARANCE
+            free[max(py - r, 0):py + r + 1, max(px - r, 0):px + r + 1] = False
+            for x, y in list(self.runes) + list(guard_spawns):
+                free[y, x] = False
+            floor = np.argwhere(free)
+            picks = random.sample(range(len(floor)), min(extra_guards, len(floor)))
+            guard_spawns = list(guard_spawns) + [(int(floor[k][1]), int(floor[k][0])) for k in picks]
+        self.guards = []
+        self.crowd = None
+        if crowd:
+            self.crowd = GuardCrowd(guard_spawns, grid, self.paths, self.flow, self.los,
+                                    vision=GUARD_VISION_DISTANCE + level_num * 0.5,
+                                    speed=GUARD_SPEED * TILE_SIZE + level_num * 10)
+            guard_spawns = []
+        # difficulty scaling
+        for sp in guard_spawns:
+            g = Guard(sp, grid, paths=self.paths, flow=self.flow, los_table=self.los)
+            # increase guard vision/distance by level slightly
+            g.vision_distance += level_num * 0.5
+            g.speed = g.speed + level_num * 10
+            self.guards.append(g)
+        # final boss on last level, first reachable floor cell
+        if level_num == LEVEL_COUNT:
+            y, x = next((y, x) for y in range(h) for x in range(w) if labels[y, x] == home)
+            boss = Guard((x, y), grid, is_boss=True, paths=self.paths, flow=self.flow, los_table=self.los)
+            boss.vision_distance += 3
+            boss.fov += 20
+            self.guards.append(boss)
+        # guards by index, for the catch test
+        self.guard_index = SpatialHash()
+        for i, g in enumerate(self.guards):
+            self.guard_index.insert(i, g.cell)
+        self.catch_cells = math.ceil(CATCH_RADIUS / TILE_SIZE)
+        self.ai = AIScheduler()
+
+        self.player_history = deque(maxlen=PLAYER_HISTORY)  # recent player cells for guards
+        self.seen = [False] * len(self.guards)
+        self.tick = 0
+        self.time = 0.0
+        self.complete = False
+
+    @property
+    def over(self):
+        return self.complete or not self.player.alive
+
+    def step(self, inputs=IDLE, dt=SIM_DT):
+        """Advance one tick. inputs is a player.Inputs."""
+        if self.over:
+            return
+        self.tick += 1
+        self.time += dt
+        player = self.player
+        self.paths.begin_frame()
+        self.flow.begin_frame()
+        with perf.scope("player.update"):
+            player.update(dt, self.grid, inputs)
+        self.player_history.append(player.cell)
+
+        # rune collection
+        if player.cell in self.runes:
+            player.score += RUNE_SCORE
+            self.runes.discard(player.cell)
+
+        # guards update; the scheduler picks who thinks this tick and one
+        # batched visibility pass over those feeds both the state machine
+        # and the catch test (the rest are too far away to see the player)
+        guards = self.guards
+        think = self.ai.plan([g.cell for g in guards], player.cell,
+                             [g.is_boss or g.state != STATE_PATROL for g in guards])
+        thinking = np.flatnonzero(think)
+        with perf.scope("perception"):
+            self.seen = np.zeros(len(guards), dtype=bool)
+            if len(thinking):
+                self.seen[thinking] = guards_see_player([guards[i] for i in thinking], self.grid, player.cell, self.los)
+        for i, g in enumerate(guards):
+            with perf.scope("guard.update"):
+                g.update(dt, player.cell, (player.x, player.y), self.player_history,
+                         seen=bool(self.seen[i]), now=self.time, think=bool(think[i]))
+            self.guard_index.move(i, g.cell)
+        # if a guard sees the player and is close -> caught
+        for i in self.guard_index.near(player.cell, self.catch_cells):
+            g = self.guards[i]
+            if self.seen[i] and math.hypot(g.x - player.x, g.y - player.y) < CATCH_RADIUS:
+                player.alive = False
+        if self.crowd is not None:
+            crowd = self.crowd
+            with perf.scope("crowd.step"):
+                seen = crowd.step(dt, player.cell, self.time)
+            if (seen & (np.hypot(crowd.x - player.x, crowd.y - player.y) < CATCH_RADIUS)).any():
+                player.alive = False
+
+        # win condition: all runes collected
+        if player.alive and not self.runes:
+            self.complete = True
+
+    def positions(self):
+        """World positions of the player, the guards and then the crowd, as
+        an n x 2 array; the renderer blends two of these between steps."""
+        xy = np.array([(self.player.x, self.player.y)] + [(g.x, g.y) for g in self.guards])
+        if self.crowd is not None:
+            xy = np.vstack((xy, np.column_stack((self.crowd.x, self.crowd.y))))
+        return xy
+
+    def state(self):
+        """Hashable snapshot, for determinism checks."""
+        p = self.player
+        return (self.tick, p.cell, round(p.x, 6), round(p.y, 6), p.score, p.alive, tuple(sorted(self.runes)),
+                tuple((g.state, round(g.x, 6), round(g.y, 6)) for g in self.guards),
+                self.crowd and tuple(zip(self.crowd.states(), np.round(self.crowd.x, 6).tolist(),
+                                         np.round(self.crowd.y, 6).tolist())))
+
+def random_walk(rng, hold=15):
+    """Input policy for headless runs: a random direction held for a few ticks."""
+    while True:
+        inputs = Inputs(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), rng.random() < 0.2)
+        for _ in range(hold):
+            yield inputs
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run one level headless with a random-walk player.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=5000)
+    parser.add_argument("--crowd", action="store_true", help="run the regular guards as one GuardCrowd")
+    parser.add_argument("--guards", type=int, default=0, help="extra guards on random reachable cells")
+    parser.add_argument("--los-cache", nargs="?", metavar="DIR", default=LOS_CACHE_DIR,
+                        const=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".los_cache"),
+                        help="keep LOS tables on disk for repeated seeds (default dir: .los_cache)")
+    parser.add_argument("--profile", metavar="TRACE", help="time the tick scopes and dump them (.csv or .json)")
+    args = parser.parse_args()
+    if args.profile:
+        perf.set_enabled(True)
+
+    sim = Simulation(args.seed, args.level, los_cache_dir=args.los_cache, crowd=args.crowd or GUARD_CROWD, extra_guards=args.guards)
+    policy = random_walk(random.Random(args.seed))
+    t0 = time.perf_counter()
+    while sim.tick < args.ticks and not sim.over:
+        sim.step(next(policy))
+        perf.end_frame()
+    elapsed = time.perf_counter() - t0
+    outcome = "complete" if sim.complete else ("caught" if not sim.player.alive else "running")
+    print(f"seed {args.seed} level {args.level}: {sim.tick} ticks, {outcome}, score {sim.player.score}, "
+          f"{sim.tick / max(elapsed, 1e-9):.0f} ticks/s")
+    if args.profile:
+        print("trace written to", perf.dump(args.profile))
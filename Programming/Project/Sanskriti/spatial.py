@@ -0,0 +1,65 @@
+# spatial.py
+# Uniform-grid index over tile cells: entities register at a cell, move as
+# they walk, and radius queries only visit the buckets around the query, so
+# proximity checks scale with local crowding rather than the entity count.
+#   index = SpatialHash()
+#   index.insert(i, guard.cell)   # any hashable handle, e.g. a list index
+#   index.move(i, guard.cell)     # every tick; cheap within one bucket
+#   for i in index.near(player.cell, 1): ...
+from settings import SPATIAL_BUCKET
+
+class SpatialHash:
+    def __init__(self, bucket=SPATIAL_BUCKET):
+        self.bucket = bucket  # bucket side, in cells
+        self.buckets = {}  # (bx, by) -> {handle: cell}, insertion ordered
+        self.where = {}  # handle -> bucket key
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, handle):
+        return handle in self.where
+
+    def _key(self, cell):
+        return (cell[0] // self.bucket, cell[1] // self.bucket)
+
+    def clear(self):
+        self.buckets.clear()
+        self.where.clear()
+
+    def insert(self, handle, cell):
+        key = self._key(cell)
+        self.buckets.setdefault(key, {})[handle] = cell
+        self.where[handle] = key
+
+    def remove(self, handle):
+        key = self.where.pop(handle)
+        bucket = self.buckets[key]
+        del bucket[handle]
+        if not bucket:
+            del self.buckets[key]
+
+    def move(self, handle, cell):
+        key = self._key(cell)
+        if self.where[handle] == key:
+            self.buckets[key][handle] = cell
+            return
+        self.remove(handle)
+        self.buckets.setdefault(key, {})[handle] = cell
+        self.where[handle] = key
+
+    def near(self, cell, radius):
+        """Handles whose cell lies within radius cells of cell on both axes
+        (a square; callers refine with their own distance test)."""
+        cx, cy = cell
+        b = self.bucket
+        found = []
+        for by in range((cy - radius) // b, (cy + radius) // b + 1):
+            for bx in range((cx - radius) // b, (cx + radius) // b + 1):
+                bucket = self.buckets.get((bx, by))
+                if not bucket:
+                    continue
+                for handle, (x, y) in bucket.items():
+                    if abs(x - cx) <= radius and abs(y - cy) <= radius:
+                        found.append(handle)
+        return found
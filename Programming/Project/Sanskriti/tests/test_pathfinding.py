@@ -0,0 +1,90 @@
+# test_pathfinding.py
+# Jump point search against the original dict A*: same reachability, same
+# path cost, valid step-by-step paths; partial paths toward goals that
+# cannot be reached agree across engines. Run from the Sanskriti directory:
+#   python -m pytest tests
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settings import DIAGONAL_COST, ORTHO_COST
+from mapgen import generate_level, label_components
+from pathfinding import astar_dict, jps, grid_search, SearchStats
+
+def path_cost(path):
+    return sum(DIAGONAL_COST if a[0] != b[0] and a[1] != b[1] else ORTHO_COST for a, b in zip(path, path[1:]))
+
+def assert_valid(grid, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    for a, b in zip(path, path[1:]):
+        assert max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 1, (a, b)
+        assert grid[b[1], b[0]] == 0, b
+
+def floor_cells(grid):
+    return [(int(x), int(y)) for y, x in np.argwhere(grid == 0)]
+
+def compare(grid, pairs):
+    for start, goal in pairs:
+        expected = astar_dict(grid, start, goal)
+        path = jps(grid, start, goal)
+        assert bool(path) == bool(expected), (start, goal)
+        if path:
+            assert_valid(grid, path, start, goal)
+            assert path_cost(path) == pytest.approx(path_cost(expected)), (start, goal)
+
+@pytest.mark.parametrize("seed", range(8))
+def test_jps_matches_astar_on_levels(seed):
+    grid, player_cell, runes, spawns = generate_level(seed=seed, level_number=1 + seed % 5)
+    rng = random.Random(seed)
+    cells = floor_cells(grid)
+    points = [player_cell] + runes + spawns + rng.sample(cells, 6)
+    compare(grid, [(a, b) for a in points for b in points])
+
+@pytest.mark.parametrize("seed", range(12))
+def test_jps_matches_astar_on_random_grids(seed):
+    rng = np.random.default_rng(seed)
+    grid = (rng.random((15, 20)) < 0.3).astype(np.uint8)
+    cells = floor_cells(grid)
+    picks = random.Random(seed)
+    compare(grid, [(picks.choice(cells), picks.choice(cells)) for _ in range(60)])
+
+def test_jps_forwards_partial_and_stats():
+    grid = np.zeros((20, 40), dtype=np.uint8)
+    grid[:, 20] = 1
+    grid[19, 20] = 0  # a single gap at the bottom
+    start, goal = (2, 2), (37, 2)
+    stats = SearchStats()
+    path = jps(grid, start, goal, stats=stats)
+    assert path and stats.expanded > 0 and stats.length == len(path)
+    stats = SearchStats()
+    path = jps(grid, start, goal, max_nodes=1, partial=True, stats=stats)
+    assert stats.truncated and stats.partial
+    assert path and path[0] == start and path[-1] != goal
+    assert_valid(grid, path, start, path[-1])
+
+@pytest.mark.parametrize("seed", range(8))
+def test_partial_toward_unreachable_goals(seed):
+    grid, player_cell, runes, spawns = generate_level(seed=seed, level_number=1 + seed % 5)
+    labels = label_components(grid)[0]
+    home = labels[player_cell[1], player_cell[0]]
+    engine = grid_search(grid)
+    engines = (lambda *a, **k: astar_dict(grid, *a, **k), engine.search, engine.jps)
+    cells = [(int(x), int(y)) for y, x in np.argwhere(labels != home)]
+    for goal in random.Random(seed).sample(cells, 10):
+        wall = grid[goal[1], goal[0]] != 0
+        gaps = set()
+        for search in engines:
+            assert search(player_cell, goal) == []
+            stats = SearchStats()
+            path = search(player_cell, goal, partial=True, stats=stats)
+            assert path and stats.partial, goal
+            assert_valid(grid, path, player_cell, path[-1])
+            if wall or search is not engines[0]:  # the dict engine cannot tell regions apart
+                assert stats.rejected == ("wall" if wall else "unreachable")
+            gaps.add(round(np.hypot(path[-1][0] - goal[0], path[-1][1] - goal[1]), 9))
+        assert len(gaps) == 1, (goal, gaps)  # all end as close to the goal as can be reached
@@ -1,31 +1,111 @@
 # ui.py
+from collections import OrderedDict
+
 import pygame
 from settings import FONT_NAME, WHITE, BLACK, YELLOW, ORANGE, PURPLE
-from settings import TILE_SIZE
+from settings import WIDTH, TILE_SIZE, TEXT_CACHE_SIZE
+import perf
 
 pygame.font.init()
 FONT = pygame.font.Font(FONT_NAME, 18)
 BIG = pygame.font.Font(FONT_NAME, 28)
+SMALL = pygame.font.Font(FONT_NAME, 16)
 
-def draw_text(screen, text, pos, color=WHITE, center=False, font=None):
+# rendered text surfaces keyed by (text, color, font), least recently used first
+_text_cache = OrderedDict()
+
+def render_text(text, color=WHITE, font=None):
+    """Cached font.render(): identical text is only rasterized once."""
     f = font or FONT
+    key = (text, tuple(color), f)
+    surf = _text_cache.get(key)
+    if surf is not None:
+        _text_cache.move_to_end(key)
+        return surf
     surf = f.render(text, True, color)
+    _text_cache[key] = surf
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return surf
+
+def draw_text(screen, text, pos, color=WHITE, center=False, font=None):
+    surf = render_text(text, color, font)
     r = surf.get_rect()
     if center:
         r.center = pos
     else:
         r.topleft = pos
-    screen.blit(surf, r)
+    return screen.blit(surf, r)
+
+class HudLabel:
+    """HUD text bound to a value: re-rendered only when the value changes."""
+    def __init__(self, fmt, pos, color=WHITE, font=None):
+        self.fmt = fmt
+        self.pos = pos
+        self.color = color
+        self.font = font or FONT
+        self.value = None
+        self.surface = None
+
+    def draw(self, screen, value=None):
+        if self.surface is None or value != self.value:
+            self.value = value
+            self.surface = self.font.render(self.fmt.format(value), True, self.color)
+        return screen.blit(self.surface, self.pos)
+
+SCORE_LABEL = HudLabel("Score: {}", (8, 8))
+LEVEL_LABEL = HudLabel("Level: {}", (8, 30))
+STAMINA_LABEL = HudLabel("Stamina", (8 + 200 + 8, 54 - 2))
 
 def draw_hud(screen, player, level):
+    """Draw the HUD; returns the rects it touched."""
     # top-left: score and level
-    draw_text(screen, f"Score: {player.score}", (8, 8))
-    draw_text(screen, f"Level: {level}", (8, 30))
+    rects = [SCORE_LABEL.draw(screen, player.score),
+             LEVEL_LABEL.draw(screen, level)]
     # stamina bar
     bar_w = 200
     x = 8
     y = 54
     val = player.stamina / 100.0
-    pygame.draw.rect(screen, (80,80,80), (x, y, bar_w, 16))
+    rects.append(pygame.draw.rect(screen, (80,80,80), (x, y, bar_w, 16)))
     pygame.draw.rect(screen, ORANGE, (x, y, int(bar_w*val), 16))
-    draw_text(screen, "Stamina", (x + bar_w + 8, y - 2))
+    rects.append(STAMINA_LABEL.draw(screen))
+    return rects
+
+class PerfOverlay:
+    """perf.summary() as a table in the top-right corner. The summary is
+    recomputed every `refresh` frames, not every frame."""
+    COLUMNS = (0, 120, 180, 230, 275)  # x offset of each column
+
+    def __init__(self, pos=(WIDTH - 340, 8), rows=10, refresh=15):
+        self.pos = pos
+        self.rows = rows
+        self.refresh = refresh
+        self.visible = False
+        self.countdown = 0
+        self.lines = []
+
+    def toggle(self):
+        self.visible = perf.toggle()
+        self.countdown = 0
+        self.lines = []
+
+    def draw(self, screen):
+        """Draw the table; returns the rects it touched."""
+        if not self.visible:
+            return []
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.countdown = self.refresh
+            self.lines = [("scope", "mean ms", "p95", "max", "calls")]
+            for row in perf.summary()[:self.rows]:
+                self.lines.append((row["scope"], f"{row['mean_ms']:.2f}", f"{row['p95_ms']:.2f}",
+                                   f"{row['max_ms']:.1f}", f"{row['calls']:.1f}"))
+        x, y = self.pos
+        height = 18 * len(self.lines) + 8
+        bg = pygame.draw.rect(screen, (0, 0, 0), (x - 4, y - 4, 332, height))
+        for cells in self.lines:
+            for dx, cell in zip(self.COLUMNS, cells):
+                draw_text(screen, cell, (x + dx, y), color=YELLOW, font=SMALL)
+            y += 18
+        return [bg]
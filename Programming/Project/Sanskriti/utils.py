@@ -1,5 +1,6 @@
 # utils.py
 import math
+import os
 import random
 from collections import deque
 
@@ -45,6 +46,217 @@ def line_of_sight(grid, a, b):
             error += dx
     return True
 
+def los_many(grid, cells, targets):
+    """line_of_sight() from every cell in cells (n x 2 array) to one target cell or to
+    the matching row of targets, walking all Bresenham lines in lockstep.
+    Returns a boolean array."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    targets = np.broadcast_to(np.asarray(targets, dtype=np.int64).reshape(-1, 2), cells.shape)
+    h, w = grid.shape
+    x1, y1 = targets[:, 0], targets[:, 1]
+    x, y = cells[:, 0].copy(), cells[:, 1].copy()
+    dx = np.abs(x1 - x)
+    dy = np.abs(y1 - y)
+    n = 1 + dx + dy
+    x_inc = np.where(x1 > x, 1, -1)
+    y_inc = np.where(y1 > y, 1, -1)
+    error = dx - dy
+    dx *= 2
+    dy *= 2
+    clear = np.ones(len(cells), dtype=bool)
+    for step in range(int(n.max()) if len(cells) else 0):
+        active = step < n
+        clear &= ~(active & (grid[np.clip(y, 0, h - 1), np.clip(x, 0, w - 1)] == 1))
+        step_x = active & (error > 0)
+        step_y = active & (error <= 0)
+        x = np.where(step_x, x + x_inc, x)
+        error = np.where(step_x, error - dy, error)
+        y = np.where(step_y, y + y_inc, y)
+        error = np.where(step_y, error + dx, error)
+    return clear
+
+def batch_can_see(grid, cells, positions, headings, fovs, vision, player_cell, tile_size, los=None):
+    """Vectorized Guard.can_see_player for many guards at once.
+    cells/positions are n x 2 (grid cells, world pixels); headings, fovs in degrees;
+    vision in tiles; los an optional LosTable for the grid.
+    Returns a boolean visibility array."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    px, py = player_cell
+    in_range = np.hypot(px - cells[:, 0], py - cells[:, 1]) <= np.asarray(vision)
+    world = ((px + 0.5) * tile_size, (py + 0.5) * tile_size)
+    ang = np.degrees(np.arctan2(world[1] - positions[:, 1], world[0] - positions[:, 0])) % 360
+    diff = np.abs((ang - np.asarray(headings) + 180) % 360 - 180)
+    seen = in_range & (diff <= np.asarray(fovs) / 2)
+    if seen.any():
+        if los is not None:
+            seen[seen] = los.visible_many(cells[seen], player_cell)
+        else:
+            seen[seen] = los_many(grid, cells[seen], player_cell)
+    return seen
+
+class LosTable:
+    """Precomputed line of sight between every floor cell and every cell within
+    radius of it, packed as one bitset row per cell. Grids are static during a
+    level, so after the build each query is a single bit lookup; pairs farther
+    apart than radius fall back to line_of_sight."""
+    def __init__(self, grid, radius=12, bits=None):
+        self.grid = grid
+        self.radius = radius
+        self.span = 2 * radius + 1
+        if bits is None:
+            bits = self._build()
+        self.bits = bits
+        self.stride = bits.shape[1]
+        self.raw = bits.tobytes()  # bytes indexing beats ndarray scalar indexing
+
+    def _build(self):
+        grid, r, span = self.grid, self.radius, self.span
+        h, w = grid.shape
+        oy, ox = np.divmod(np.arange(span * span), span)
+        oy -= r
+        ox -= r
+        keep = ox * ox + oy * oy <= r * r
+        src = np.flatnonzero(grid.ravel() == 0)
+        sx, sy = src % w, src // w
+        # every (floor cell, offset) pair inside the radius and the grid
+        tx = sx[:, None] + ox[None, :]
+        ty = sy[:, None] + oy[None, :]
+        valid = keep[None, :] & (tx >= 0) & (tx < w) & (ty >= 0) & (ty < h)
+        rows, cols = np.nonzero(valid)
+        tx, ty = tx[rows, cols], ty[rows, cols]
+        floor = grid[ty, tx] == 0
+        rows, cols, tx, ty = rows[floor], cols[floor], tx[floor], ty[floor]
+        mask = np.zeros((h * w, span * span), dtype=bool)
+        mask[src[rows], cols] = los_many(grid, np.stack([sx[rows], sy[rows]], axis=1), np.stack([tx, ty], axis=1))
+        return np.packbits(mask, axis=1, bitorder="little")
+
+    @classmethod
+    def load_or_build(cls, grid, seed, level, radius=12, cache_dir=None, max_entries=32):
+        """Reuse a table saved for this seed+level if its grid still matches.
+        The cache keeps at most max_entries tables; the least recently used
+        ones are deleted first."""
+        if cache_dir is None:
+            return cls(grid, radius)
+        path = os.path.join(cache_dir, f"los_{seed}_{level}_{radius}.npz")
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    if np.array_equal(data["grid"], grid):
+                        table = cls(grid, radius, bits=data["bits"])
+                        os.utime(path)  # mark as recently used
+                        return table
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable cache entry: rebuild below
+        table = cls(grid, radius)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(path, grid=grid, bits=table.bits)
+        cls._evict(cache_dir, max_entries)
+        return table
+
+    @staticmethod
+    def _evict(cache_dir, max_entries):
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+                   if name.startswith("los_") and name.endswith(".npz")]
+        if len(entries) <= max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already gone
+
+    def visible(self, a, b):
+        """Same answer as line_of_sight(grid, a, b)."""
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        r = self.radius
+        if dx * dx + dy * dy > r * r:
+            return line_of_sight(self.grid, a, b)
+        if self.grid[a[1], a[0]] != 0:
+            return False
+        k = (dy + r) * self.span + dx + r
+        i = a[1] * self.grid.shape[1] + a[0]
+        return bool(self.raw[i * self.stride + (k >> 3)] >> (k & 7) & 1)
+
+    def visible_many(self, cells, target):
+        """Vectorized visible() from each of cells to target."""
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        h, w = self.grid.shape
+        r = self.radius
+        dx = target[0] - cells[:, 0]
+        dy = target[1] - cells[:, 1]
+        near = dx * dx + dy * dy <= r * r
+        k = (dy + r) * self.span + dx + r
+        i = cells[:, 1] * w + cells[:, 0]
+        out = np.zeros(len(cells), dtype=bool)
+        out[near] = (self.bits[i[near], k[near] >> 3] >> (k[near] & 7)) & 1
+        if (~near).any():
+            out[~near] = los_many(self.grid, cells[~near], target)
+        return out
+
+# (xx, xy, yx, yy) transforms mapping the first octant onto all eight
+_OCTANTS = [(1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+            (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)]
+
+def _cast_light(cells, mask, cx, cy, row, start, end, radius, xx, xy, yx, yy):
+    if start < end:
+        return
+    h, w = len(cells), len(cells[0])
+    r2 = radius * radius
+    new_start = 0.0
+    for j in range(row, int(radius) + 1):
+        dx, dy = -j - 1, -j
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            x = cx + dx * xx + dy * xy
+            y = cy + dx * yx + dy * yy
+            l_slope = (dx - 0.5) / (dy + 0.5)
+            r_slope = (dx + 0.5) / (dy - 0.5)
+            if start < r_slope:
+                continue
+            if end > l_slope:
+                break
+            inside = 0 <= x < w and 0 <= y < h
+            if inside and dx * dx + dy * dy <= r2:
+                mask[y, x] = True
+            opaque = not inside or cells[y][x] == 1
+            if blocked:
+                if opaque:
+                    new_start = r_slope
+                else:
+                    blocked = False
+                    start = new_start
+            elif opaque and j < radius:
+                # wall starts a shadow: scan the lit part above it, then skip past it
+                blocked = True
+                _cast_light(cells, mask, cx, cy, j + 1, start, l_slope, radius, xx, xy, yx, yy)
+                new_start = r_slope
+        if blocked:
+            break
+
+def shadowcast_fov(grid, origin, radius, heading=None, fov=None):
+    """Recursive shadowcasting field of view.
+    Returns a boolean mask (grid-shaped) of cells visible from origin within
+    radius tiles; walls that block sight are themselves marked visible.
+    With heading/fov (degrees, angle_between convention) the mask is also
+    clipped to that view cone."""
+    mask = np.zeros(grid.shape, dtype=bool)
+    cx, cy = origin
+    mask[cy, cx] = True
+    cells = grid.tolist()
+    for xx, xy, yx, yy in _OCTANTS:
+        _cast_light(cells, mask, cx, cy, 1, 1.0, 0.0, radius, xx, xy, yx, yy)
+    if heading is not None and fov is not None:
+        ys, xs = np.nonzero(mask)
+        ang = np.degrees(np.arctan2(ys - cy, xs - cx)) % 360
+        outside = np.abs((ang - heading + 180) % 360 - 180) > fov / 2
+        outside &= (xs != cx) | (ys != cy)
+        mask[ys[outside], xs[outside]] = False
+    return mask
+
 def angle_between(a_pos, b_pos):
     ax, ay = a_pos
     bx, by = b_pos
@@ -1,9 +1,8 @@
 # guard3d.py
 import time as _time
-from ursina import Entity, Vec3, color
-from settings3d import (TILE_SIZE, GUARD_SPEED, GUARD_VISION_DISTANCE, GUARD_FOV_DEG,
-                        COLOR_GUARD, COLOR_BOSS)
-from utils3d import to_grid_from_world, world_from_grid, los_grid, angle_to, ang_diff
+from collections import deque
+from settings3d import TILE_SIZE, GUARD_SPEED, GUARD_VISION_DISTANCE, GUARD_FOV_DEG, GUARD_MEMORY
+from utils3d import to_grid_from_world, world_from_grid, los_grid, angle_to, ang_diff, batch_can_see
 from pathfinding import astar
 
 STATE_PATROL = "patrol"
@@ -11,41 +10,59 @@ STATE_CHASE = "chase"
 STATE_SEARCH = "search"
 STATE_BOSS = "boss"
 
-class Guard(Entity):
-    def __init__(self, start_cell, grid, is_boss=False):
-        x, z = world_from_grid(start_cell)
-        super().__init__(model='capsule',
-                         color=color.rgba(*(COLOR_BOSS if is_boss else COLOR_GUARD)),
-                         scale=Vec3(0.6, 1.1, 0.6), position=Vec3(x, 0.55, z))
+def guards_see_player(guards, grid, player, los=None):
+    # visibility for every guard in one NumPy pass
+    return batch_can_see(grid, [g.cell for g in guards], [(g.x, g.z) for g in guards],
+                         [g.heading for g in guards], [g.fov for g in guards],
+                         [g.vision_dist for g in guards], player.cell, (player.x, player.z), los)
+
+class Guard:
+    """Guard state and AI on the XZ plane, in world units. No Ursina here:
+    main_ursina draws an entity (and its vision cone) from x, z, heading,
+    fov and vision_dist."""
+    def __init__(self, start_cell, grid, is_boss=False, paths=None, flow=None, los_table=None):
+        self.x, self.z = world_from_grid(start_cell)
         self.grid = grid
+        self.paths = paths  # shared per-level PathService, or None for direct astar()
+        self.flow = flow    # shared FlowField toward the player, or None for per-guard A*
+        self.los_table = los_table  # precomputed utils3d.LosTable, or None for los_grid()
         self.speed = GUARD_SPEED
         self.is_boss = is_boss
         self.vision_dist = GUARD_VISION_DISTANCE + (3 if is_boss else 0)
         self.fov = GUARD_FOV_DEG + (20 if is_boss else 0)
         self.state = STATE_PATROL
-        self.path = []
+        self.path = ()      # cells to walk, shared with the path cache; path_index is the next one
         self.path_index = 0
+        self.path_goal = None
         self.heading = 0.0
-        self.player_memory = []
+        self.player_memory = deque(maxlen=GUARD_MEMORY)
         self.last_saw_time = None
+        self.now = 0.0  # game clock of the current update, in seconds
         self.search_timer = 0
 
-        # visual "vision cone" (approx) — a translucent cone in front
-        self.cone = Entity(parent=self, model='cone', color=color.rgba(1,1,0.5,0.12),
-                           scale=Vec3(0.7 + self.fov/180, 0.4, self.vision_dist),
-                           position=Vec3(0, 0.2, 0.4), rotation_x=90)
-
     @property
     def cell(self):
         gx, gy = to_grid_from_world(self.x, self.z)
         return (gx, gy)
 
-    def _set_path_to(self, target_cell):
-        p = astar(self.grid, self.cell, target_cell)
+    def _set_path_to(self, target_cell, partial=False):
+        # partial: when the search gives up, head for the closest cell it reached
+        if self.paths is not None:
+            p = self.paths.find(self.cell, target_cell, partial=partial)
+            if p is None:
+                return  # over this frame's replanning budget; keep current path
+        else:
+            p = astar(self.grid, self.cell, target_cell, partial=partial)
+        self.path_goal = target_cell
         if p and len(p) > 1:
-            self.path = p[1:]; self.path_index = 0
+            self.path = p; self.path_index = 1  # p[0] is the guard's own cell
         else:
-            self.path = []; self.path_index = 0
+            self.path = (); self.path_index = 0
+
+    def _replan_to(self, target_cell, partial=False):
+        # only search again when the goal cell moved or the path ran out
+        if target_cell != self.path_goal or not self.path:
+            self._set_path_to(target_cell, partial)
 
     def _follow_path(self, dt):
         if not self.path:
@@ -60,7 +77,7 @@ class Guard(Entity):
             self.x, self.z = tx, tz
             self.path_index += 1
             if self.path_index >= len(self.path):
-                self.path = []; self.path_index = 0
+                self.path = (); self.path_index = 0
             return
         vx = dx / max(0.0001, dist) * self.speed
         vz = dz / max(0.0001, dist) * self.speed
@@ -68,7 +85,6 @@ class Guard(Entity):
         self.z += vz * dt
         # face movement direction
         self.heading = angle_to((self.x, self.z), (self.x + dx, self.z + dz))
-        self.rotation_y = self.heading
 
     def can_see_player(self, player_cell, player_world, grid):
         # distance (grid distance for LOS check)
@@ -81,6 +97,8 @@ class Guard(Entity):
         if ang_diff(yaw_to_player, self.heading) > self.fov / 2:
             return False
         # line-of-sight through tiles
+        if self.los_table is not None:
+            return self.los_table.visible(self.cell, player_cell)
         return los_grid(grid, self.cell, player_cell)
 
     def patrol(self, dt):
@@ -94,8 +112,17 @@ class Guard(Entity):
                 self._set_path_to(random.choice(valid))
         self._follow_path(dt)
 
+    def _step_toward_player(self, player_cell):
+        # next cell straight from the shared flow field, no search
+        step = self.flow.next_cell(self.cell, player_cell)
+        self.path = (step,) if step else (); self.path_index = 0
+        self.path_goal = player_cell
+
     def chase(self, dt, player_cell):
-        self._set_path_to(player_cell)
+        if self.flow is not None:
+            self._step_toward_player(player_cell)
+        else:
+            self._replan_to(player_cell, partial=True)
         self._follow_path(dt)
 
     def search(self, dt):
@@ -106,8 +133,6 @@ class Guard(Entity):
     def boss_logic(self, dt, player_cell, player_hist):
         if player_cell:
             self.player_memory.append(player_cell)
-            if len(self.player_memory) > 8:
-                self.player_memory.pop(0)
         # predict linear next
         pred = player_cell
         if len(self.player_memory) >= 3:
@@ -118,33 +143,47 @@ class Guard(Entity):
             pred = (int(max(0, min(self.grid.shape[1]-1, x2+vx))),
                     int(max(0, min(self.grid.shape[0]-1, y2+vy))))
         target = pred or player_cell
-        self._set_path_to(target)
-        if not self.path:
-            self._set_path_to(player_cell)
+        if self.flow is not None:
+            # skip the search entirely when the predicted cell can't reach the player
+            self.flow.update(player_cell)
+            if target != player_cell and self.flow.reachable(target):
+                self._replan_to(target)
+            if target == player_cell or not self.path:
+                self._step_toward_player(player_cell)
+        else:
+            # a target in a wall or a cut-off pocket is rejected without searching
+            self._replan_to(target)
+            if not self.path:
+                self._replan_to(player_cell, partial=True)
         self._follow_path(dt)
         # adaptive vision
-        now = _time.time()
-        if self.last_saw_time is None or (now - self.last_saw_time) > 5:
+        if self.last_saw_time is None or (self.now - self.last_saw_time) > 5:
             self.vision_dist = min(self.vision_dist + 0.01, max(self.grid.shape))
         else:
             self.vision_dist = max(4, self.vision_dist - 0.05)
-        self.cone.scale_z = self.vision_dist
 
-    def update_logic(self, dt, player, player_hist):
-        player_world = (player.x, player.z)
-        seen = self.can_see_player(player.cell, player_world, self.grid)
+    def update(self, dt, player, player_hist, seen=None, now=None, think=True):
+        # now: simulation clock in seconds (sim3d.Simulation.time);
+        # falls back to the wall clock for standalone use
+        self.now = _time.monotonic() if now is None else now
+        if not think:
+            # skipped by the AI scheduler (lod.py): keep walking, decide nothing
+            if self.state != STATE_SEARCH:
+                self._follow_path(dt)
+            return
+        # seen comes precomputed from guards_see_player() when batching
+        if seen is None:
+            seen = self.can_see_player(player.cell, (player.x, player.z), self.grid)
         if seen:
-            self.last_saw_time = _time.time()
+            self.last_saw_time = self.now
             self.state = STATE_BOSS if self.is_boss else STATE_CHASE
         else:
-            if self.last_saw_time and (_time.time() - self.last_saw_time) < 4:
+            if self.last_saw_time is not None and (self.now - self.last_saw_time) < 4:
                 self.state = STATE_SEARCH
                 self.search_timer = 2.5
             else:
                 self.state = STATE_PATROL
 
-        # rotate visual cone with heading
-        self.rotation_y = self.heading
         # behaviors
         if self.state == STATE_PATROL:
             self.patrol(dt)
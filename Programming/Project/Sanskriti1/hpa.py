@@ -0,0 +1,72 @@
+# hpa.py
+import heapq
+
+from pathfinding import astar, octile, SearchStats
+
+class HierarchicalPlanner:
+    """HPA*-style planner over a mapgen.RoomGraph.
+    Plans across rooms and corridors on the abstract portal graph, then
+    refines only the next segment (up to the first portal outside the start
+    cluster) on the real grid. Callers ask again once that segment is walked."""
+    def __init__(self, graph):
+        self.graph = graph
+
+    def abstract_path(self, start, goal):
+        """Portal cells from start's cluster to goal's cluster, or None."""
+        graph = self.graph
+        exits = graph.distances_from(goal)  # symmetric costs: goal -> portal == portal -> goal
+        if not exits:
+            return None
+        best = {}
+        came = {}
+        open_set = []
+        for i, d in graph.distances_from(start).items():
+            best[i] = d
+            came[i] = None
+            heapq.heappush(open_set, (d + octile(graph.nodes[i], goal), d, i))
+        done = set()
+        while open_set:
+            _, cost, i = heapq.heappop(open_set)
+            if i == -1:
+                break
+            if i in done:
+                continue
+            done.add(i)
+            if i in exits:
+                total = cost + exits[i]
+                if total < best.get(-1, float("inf")):
+                    best[-1] = total
+                    came[-1] = i
+                    heapq.heappush(open_set, (total, total, -1))
+            for j, step in graph.edges[i]:
+                new_cost = cost + step
+                if j not in done and new_cost < best.get(j, float("inf")):
+                    best[j] = new_cost
+                    came[j] = i
+                    heapq.heappush(open_set, (new_cost + octile(graph.nodes[j], goal), new_cost, j))
+        if -1 not in came:
+            return None
+        nodes = []
+        i = came[-1]
+        while i is not None:
+            nodes.append(graph.nodes[i])
+            i = came[i]
+        nodes.reverse()
+        return nodes
+
+    def find_path(self, grid, start, goal, max_nodes=10000, partial=False, stats=None):
+        """Drop-in for astar(): a path that starts at start and heads for goal.
+        Within one cluster it is the full path; otherwise it ends at the
+        first portal beyond the start cluster."""
+        graph = self.graph
+        home = graph.cluster_at(start)
+        if home < 0 or home == graph.cluster_at(goal) or graph.cluster_at(goal) < 0:
+            return astar(grid, start, goal, max_nodes, partial, stats)
+        portals = self.abstract_path(start, goal)
+        if portals is None:
+            if partial:
+                # no route between the clusters: astar heads for the closest reachable cell
+                return astar(grid, start, goal, max_nodes, partial, stats)
+            return (stats or SearchStats()).record(0, [], rejected="unreachable")
+        target = next((c for c in portals if graph.cluster_at(c) != home), goal)
+        return astar(grid, start, target, max_nodes, partial, stats)
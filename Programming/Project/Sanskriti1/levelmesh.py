@@ -0,0 +1,71 @@
+# levelmesh.py
+# Level geometry as a few merged meshes instead of one Entity per tile
+import numpy as np
+from ursina import Entity, Mesh, color
+from settings3d import TILE_SIZE, COLOR_FLOOR, COLOR_WALL, MESH_CHUNK
+
+WALL_HEIGHT = 1.0
+
+# exposed wall side faces: (dx, dy) of the neighbour, outward normal, corner (x, y, z) offsets
+_SIDES = [
+    ((1, 0), (1, 0, 0), [(.5, 0, -.5), (.5, 1, -.5), (.5, 1, .5), (.5, 0, .5)]),
+    ((-1, 0), (-1, 0, 0), [(-.5, 0, .5), (-.5, 1, .5), (-.5, 1, -.5), (-.5, 0, -.5)]),
+    ((0, 1), (0, 0, 1), [(.5, 0, .5), (.5, 1, .5), (-.5, 1, .5), (-.5, 0, .5)]),
+    ((0, -1), (0, 0, -1), [(-.5, 0, -.5), (-.5, 1, -.5), (.5, 1, -.5), (.5, 0, -.5)]),
+]
+_TOP = [(-.5, 0, -.5), (-.5, 0, .5), (.5, 0, .5), (.5, 0, -.5)]
+
+def _quads(xs, ys, corners, height, normal, rgba):
+    """Vertices/normals/colors for one quad per (x, y) cell, all facing normal."""
+    n = len(xs)
+    c = np.asarray(corners, dtype=float)
+    verts = np.empty((n, 4, 3))
+    verts[:, :, 0] = (xs[:, None] + c[None, :, 0]) * TILE_SIZE
+    verts[:, :, 1] = c[None, :, 1] * WALL_HEIGHT + height
+    verts[:, :, 2] = (ys[:, None] + c[None, :, 2]) * TILE_SIZE
+    return verts.reshape(-1, 3), np.tile(normal, (n * 4, 1)), [rgba] * (n * 4)
+
+def build_chunk_mesh(grid, x0, y0, x1, y1):
+    """One Mesh holding the floor quads, wall tops and exposed wall sides of
+    the cells grid[y0:y1, x0:x1]. Returns None for an empty chunk."""
+    walls = np.pad(grid != 0, 1, constant_values=False)
+    parts = []
+    ys, xs = np.nonzero(grid[y0:y1, x0:x1] == 0)
+    parts.append(_quads(xs + x0, ys + y0, _TOP, 0.0, (0, 1, 0), color.rgba(*COLOR_FLOOR)))
+    ys, xs = np.nonzero(grid[y0:y1, x0:x1] != 0)
+    xs, ys = xs + x0, ys + y0
+    wall_color = color.rgba(*COLOR_WALL)
+    parts.append(_quads(xs, ys, _TOP, WALL_HEIGHT, (0, 1, 0), wall_color))
+    for (dx, dy), normal, corners in _SIDES:
+        # a side is only visible when the neighbour that way is not a wall
+        open_side = ~walls[ys + 1 + dy, xs + 1 + dx]
+        parts.append(_quads(xs[open_side], ys[open_side], corners, 0.0, normal, wall_color))
+    verts = np.concatenate([p[0] for p in parts])
+    if not len(verts):
+        return None
+    normals = np.concatenate([p[1] for p in parts])
+    colors = [c for p in parts for c in p[2]]
+    base = np.arange(0, len(verts), 4)
+    tris = np.stack([base, base + 1, base + 2, base, base + 2, base + 3], axis=1).ravel()
+    return Mesh(vertices=verts.tolist(), triangles=tris.tolist(), colors=colors,
+                normals=normals.tolist(), static=True)
+
+def make_chunk_entity(mesh, parent=None):
+    # double sided so face winding never hides a tile from the tilted camera
+    return Entity(parent=parent, model=mesh, double_sided=True)
+
+def build_level_meshes(grid, parent=None, chunk=MESH_CHUNK, pool=None):
+    """Floors and walls for the whole grid as one Entity per chunk x chunk block.
+    With a pool.EntityPool the chunk entities are recycled and just get new meshes."""
+    h, w = grid.shape
+    entities = []
+    for y0 in range(0, h, chunk):
+        for x0 in range(0, w, chunk):
+            mesh = build_chunk_mesh(grid, x0, y0, min(x0 + chunk, w), min(y0 + chunk, h))
+            if mesh is None:
+                continue
+            if pool is not None:
+                entities.append(pool.acquire(mesh))
+            else:
+                entities.append(make_chunk_entity(mesh, parent))
+    return entities
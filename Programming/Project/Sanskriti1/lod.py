@@ -0,0 +1,29 @@
+# lod.py
+# Level of detail for guard AI. Guards near the player, alerted guards and
+# bosses think (perception, state machine, replanning) every tick; calm
+# guards farther out think once every AI_FAR_INTERVAL ticks, staggered
+# round-robin so each tick carries about the same share. On the ticks in
+# between a guard only keeps walking its current path.
+import numpy as np
+
+from settings3d import AI_LOD, AI_NEAR_RADIUS, AI_FAR_INTERVAL
+
+class AIScheduler:
+    def __init__(self, near=AI_NEAR_RADIUS, interval=AI_FAR_INTERVAL, enabled=AI_LOD):
+        self.near = near  # tiles
+        self.interval = interval
+        self.enabled = enabled
+        self.tick = 0
+
+    def plan(self, cells, player_cell, alert):
+        """Which guards think this tick, as a boolean array. cells are the
+        guards' grid cells; alert marks the ones that must think every tick."""
+        self.tick += 1
+        alert = np.asarray(alert, dtype=bool)
+        if not self.enabled or self.interval <= 1:
+            return np.ones(len(alert), dtype=bool)
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        px, py = player_cell
+        near = np.hypot(cells[:, 0] - px, cells[:, 1] - py) <= self.near
+        turn = (np.arange(len(cells)) + self.tick) % self.interval == 0
+        return near | alert | turn
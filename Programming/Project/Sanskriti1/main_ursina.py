@@ -1,15 +1,17 @@
 # main_ursina.py
 # Sanskriti: The Lost Scripts — Ursina 3D Edition
-from ursina import Ursina, Entity, Sky, DirectionalLight, AmbientLight, Vec3, color, camera, time, destroy
+from ursina import Ursina, Entity, Sky, DirectionalLight, AmbientLight, Vec3, color, camera, time, destroy, held_keys
 import random, math, sys
 import numpy as np
 
 from settings3d import *
-from mapgen import generate_level
-from player3d import Player
-from guard3d import Guard
-from ui3d import HUD, show_lore
+from sim3d import Simulation
+from player3d import Inputs
+from ui3d import HUD, PerfOverlay, show_lore
 from utils3d import world_from_grid
+from levelmesh import build_level_meshes, make_chunk_entity
+from pool import EntityPool
+import perf
 
 app = Ursina(title='Sanskriti: The Lost Scripts — 3D')
 
@@ -19,132 +21,130 @@ sun = DirectionalLight(shadows=False)
 sun.look_at(Vec3(1,-2,1))
 AmbientLight(color=color.rgba(0.5,0.5,0.6,1))
 
-# Globals per level
+# Globals per level: the rules live in sim (a sim3d.Simulation); this module
+# only feeds it the keys and copies its state onto entities
 level_num = 1
-player = None
-guards = []
-runes = []
-grid = None
+sim = None
+guard_views = []  # one entity per sim.guards entry, same order
+runes = {}  # uncollected rune cell -> sphere entity
 hud = HUD()
-player_history = []
+perf_overlay = PerfOverlay()
+# fixed-timestep clock: frame time piles up in sim_acc and is spent in SIM_DT
+# steps; between steps the entities are drawn blended from prev_xz to sim_xz
+sim_acc = 0.0
+prev_xz = sim_xz = None
 
 # World holders
 world_root = Entity()
-floor_root = Entity(parent=world_root)
-wall_root = Entity(parent=world_root)
 rune_root = Entity(parent=world_root)
 guard_root = Entity(parent=world_root)
+player_view = Entity(model='capsule', color=color.rgba(*COLOR_PLAYER), scale=Vec3(0.6, 1.1, 0.6), y=0.55)
+
+def make_guard_view(is_boss):
+    view = Entity(model='capsule', scale=Vec3(0.6, 1.1, 0.6), y=0.55)
+    # visual "vision cone" (approx) — a translucent cone in front
+    view.cone = Entity(parent=view, model='cone', color=color.rgba(1,1,0.5,0.12),
+                       position=Vec3(0, 0.2, 0.4), rotation_x=90)
+    dress_guard_view(view, is_boss)
+    return view
+
+def dress_guard_view(view, is_boss):
+    view.color = color.rgba(*(COLOR_BOSS if is_boss else COLOR_GUARD))
+
+def make_rune(pos):
+    return Entity(parent=rune_root, model='sphere', color=color.rgba(*COLOR_RUNE),
+                  position=pos, scale=0.35)
+
+def place_rune(sphere, pos):
+    sphere.position = pos
+
+def remesh_chunk(chunk, mesh):
+    chunk.model = mesh
+
+# Entities are recycled between build_level calls instead of destroyed
+guard_pool = EntityPool(make_guard_view, dress_guard_view)
+rune_pool = EntityPool(make_rune, place_rune)
+chunk_pool = EntityPool(lambda mesh: make_chunk_entity(mesh, world_root), remesh_chunk)
 
 def clear_world():
-    for ch in list(world_root.children):
-        destroy(ch)
-    floor_root.children.clear()
-    wall_root.children.clear()
-    rune_root.children.clear()
-    guard_root.children.clear()
+    guard_pool.release_all()
+    rune_pool.release_all()
+    chunk_pool.release_all()
 
 def build_level(seed, level_n):
-    global grid, player, guards, runes, player_history
+    global sim, guard_views, runes
     clear_world()
-    grid, start_cell, rune_cells, guard_spawns = generate_level(seed=seed, level_number=level_n)
-
-    # Build floor as tiles (thin quads) for clarity
-    h, w = grid.shape
-    for y in range(h):
-        for x in range(w):
-            if grid[y,x] == 0:
-                wx, wz = world_from_grid((x,y))
-                Entity(parent=floor_root, model='quad', color=color.rgba(*COLOR_FLOOR),
-                       position=Vec3(wx, 0.0, wz), rotation_x=90, scale=Vec3(TILE_SIZE, TILE_SIZE, 1))
-
-    # Build walls as cubes
-    for y in range(h):
-        for x in range(w):
-            if grid[y,x] == 1:
-                wx, wz = world_from_grid((x,y))
-                Entity(parent=wall_root, model='cube', color=color.rgba(*COLOR_WALL),
-                       position=Vec3(wx, 0.5, wz), scale=Vec3(TILE_SIZE, 1.0, TILE_SIZE))
-
-    # Player
-    player = Player(start_cell)
+    sim = Simulation(seed, level_n)
+
+    # Floors and walls as a few merged chunk meshes (one draw call each)
+    h, w = sim.grid.shape
+    build_level_meshes(sim.grid, pool=chunk_pool)
 
     # Runes as glowing spheres
-    runes = []
-    # ensure at least 3 runes
-    rc = list(rune_cells)
-    while len(rc) < 3:
-        rx = random.randint(1, w-2); ry = random.randint(1, h-2)
-        if grid[ry, rx] == 0 and (rx, ry) != start_cell:
-            rc.append((rx, ry))
-    for (rx, ry) in rc:
+    runes = {}
+    for (rx, ry) in sim.runes:
         wx, wz = world_from_grid((rx, ry))
-        sphere = Entity(parent=rune_root, model='sphere', color=color.rgba(*COLOR_RUNE),
-                        position=Vec3(wx, 0.4, wz), scale=0.35)
-        runes.append({'cell': (rx, ry), 'entity': sphere})
+        runes[(rx, ry)] = rune_pool.acquire(Vec3(wx, 0.4, wz))
 
     # Guards
-    guards = []
-    for sp in guard_spawns:
-        g = Guard(sp, grid, is_boss=False)
-        # scale difficulty per level
-        g.speed = GUARD_SPEED * (1.0 + 0.08*level_n)
-        g.vision_dist = GUARD_VISION_DISTANCE + 0.5 * level_n
-        guards.append(g)
-
-    # Final boss on last level
-    if level_n == LEVEL_COUNT:
-        # place boss near farthest walkable
-        far = None; far_d = -1; target = (0,0)
-        for y in range(h):
-            for x in range(w):
-                if grid[y,x]==0:
-                    d = (x - start_cell[0])**2 + (y - start_cell[1])**2
-                    if d > far_d: far_d = d; target = (x,y)
-        boss = Guard(target, grid, is_boss=True)
-        boss.speed = GUARD_SPEED * (1.1 + 0.1*level_n)
-        guards.append(boss)
+    guard_views = [guard_pool.acquire(g.is_boss) for g in sim.guards]
 
     # Camera
     cx, cz = world_from_grid((w//2, h//2))
     camera.position = (cx, CAM_HEIGHT, cz - 0.001)
     camera.rotation_x = CAM_TILT_DEG
 
-    player_history = []
-
-def check_player_caught():
-    # If guard sees and is close enough in world space
-    for g in guards:
-        dx = g.x - player.x
-        dz = g.z - player.z
-        if (dx*dx + dz*dz) ** 0.5 < 0.55:
-            return True
-    return False
-
-def collect_runes():
-    # If player's cell matches a rune, collect it
-    for r in list(runes):
-        if player.cell == r['cell']:
-            player.score += RUNE_SCORE
-            destroy(r['entity'])
-            runes.remove(r)
+    reset_clock()
+
+def show_actors(xz):
+    # copy (blended) positions onto the entities, and each guard's heading
+    # and vision onto its cone
+    player_view.x, player_view.z = xz[0].tolist()
+    for g, view, (x, z) in zip(sim.guards, guard_views, xz[1:].tolist()):
+        view.x, view.z = x, z
+        view.rotation_y = g.heading
+        view.cone.scale = Vec3(0.7 + g.fov/180, 0.4, g.vision_dist)
+
+def show_runes():
+    # hide the spheres of the runes collected since last frame
+    for cell in [c for c in runes if c not in sim.runes]:
+        rune_pool.release(runes.pop(cell))
+
+def reset_clock():
+    global sim_acc, prev_xz, sim_xz
+    sim_acc = 0.0
+    prev_xz = sim_xz = sim.positions()
+    show_actors(sim_xz)
+
+def read_inputs():
+    # WASD on XZ plane
+    return Inputs(held_keys['d'] - held_keys['a'], held_keys['w'] - held_keys['s'], bool(held_keys['shift']))
 
 def level_loop():
-    """Called each frame via Ursina's update hook."""
-    global level_num
-    dt = time.dt
-    # Update player movement & stamina
-    player.update_logic(grid)
-    # Store history
-    player_history.append(player.cell)
-    if len(player_history) > 20:
-        player_history.pop(0)
-    # Guards
-    for g in guards:
-        g.update_logic(dt, player, player_history)
-    # Rune collection
-    collect_runes()
+    """Called each frame via Ursina's update hook: feeds the keys to the
+    simulation in SIM_DT steps and draws it blended between the last two."""
+    global sim_acc, prev_xz, sim_xz
+    sim_acc += min(time.dt, MAX_FRAME_DT)
+    inputs = read_inputs()
+    steps = 0
+    while sim_acc >= SIM_DT and steps < MAX_SIM_STEPS and not sim.over:
+        prev_xz = sim_xz
+        sim.step(inputs, SIM_DT)
+        sim_xz = sim.positions()
+        sim_acc -= SIM_DT
+        steps += 1
+    if steps == MAX_SIM_STEPS:
+        # too far behind to catch up: drop the backlog rather than spiral
+        sim_acc = min(sim_acc, SIM_DT)
+    if sim.over:
+        show_actors(sim_xz)
+    else:
+        show_actors(prev_xz + (sim_xz - prev_xz) * (sim_acc / SIM_DT))
+    show_runes()
+    player = sim.player
+
     # Caught?
-    if check_player_caught():
+    if not player.alive:
         # Simple restart: show text and reload level
         from ursina import Text, invoke, destroy, held_keys
         t = Text(text='You were caught! Press R to retry.', position=(0,0), origin=(0,0), scale=1.2, color=color.white)
@@ -163,12 +163,12 @@ def level_loop():
         return
 
     # Win condition
-    if not runes:
+    if sim.complete:
         show_lore(get_lore_for_level(level_num))
         # advance after short delay to avoid double-trigger
         from ursina import invoke
         def next_level():
-            nonlocal level_num
+            global level_num
             level_num += 1
             if level_num <= LEVEL_COUNT:
                 build_level(seed=random.randint(0,999999), level_n=level_num)
@@ -215,6 +215,13 @@ def start_game():
     build_level(seed=random.randint(0, 999999), level_n=level_num)
     app.update = level_loop
 
+def input(key):
+    # Ursina hotkeys: F3 profiler overlay, F4 dump the profiled frames
+    if key == 'f3':
+        perf_overlay.toggle()
+    elif key == 'f4' and perf.enabled:
+        print("trace written to", perf.dump())
+
 # Start
 start_game()
 app.run()
@@ -1,13 +1,16 @@
 # mapgen.py
 # Room-and-corridor procedural generation (same logic as 2D, but engine-agnostic)
+import heapq
 import random
 import numpy as np
-from settings3d import GRID_W, GRID_H
+from settings3d import GRID_W, GRID_H, ORTHO_COST, DIAG_COST
 
 WALL = 1
 FLOOR = 0
 
 class Room:
+    __slots__ = ("x", "y", "w", "h")
+
     def __init__(self, x, y, w, h):
         self.x, self.y, self.w, self.h = x, y, w, h
     def center(self):
@@ -30,62 +33,255 @@ def carve_v(grid, y1, y2, x):
     if y2 < y1: y1, y2 = y2, y1
     grid[y1:y2+1, x] = FLOOR
 
-def generate_level(seed=None, level_number=1):
+STEPS = [(dx, dy, DIAG_COST if dx and dy else ORTHO_COST)
+         for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+# the four forward neighbour offsets; with their mirror images they are all 8 moves
+_LINKS = [(1, 0), (-1, 1), (0, 1), (1, 1)]
+
+def label_components(grid):
+    """8-connected components of the floor (the moves A* makes), vectorized.
+    Each cell keeps a parent index no larger than its own; every pass hooks
+    the larger root of each edge under the smaller and pointer jumping then
+    flattens the trees, until no edge joins two roots.
+    Returns (labels, count): labels is int32 shaped like grid, -1 on walls,
+    components numbered 0..count-1 in row-major order of their first cell."""
+    h, w = grid.shape
+    floor = grid == FLOOR
+    cells = np.flatnonzero(floor)
+    # floor cells numbered 0..n-1 in row-major order; walls are left out
+    index = np.full(h * w, -1)
+    index[cells] = np.arange(len(cells))
+    index = index.reshape(h, w)
+    us, vs = [], []
+    for dx, dy in _LINKS:
+        x0, x1 = max(0, -dx), w - max(0, dx)
+        both = floor[:h-dy, x0:x1] & floor[dy:, x0+dx:x1+dx]
+        us.append(index[:h-dy, x0:x1][both])
+        vs.append(index[dy:, x0+dx:x1+dx][both])
+    u = np.concatenate(us)
+    v = np.concatenate(vs)
+    parent = np.arange(len(cells))
+    while True:
+        pu, pv = parent[u], parent[v]
+        split = pu != pv
+        if not split.any():
+            break
+        # edges whose ends already share a root keep sharing it
+        u, v, pu, pv = u[split], v[split], pu[split], pv[split]
+        np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    # a component's root is its first cell, so numbering the roots in
+    # order numbers the components in row-major order
+    roots = parent == np.arange(len(cells))
+    ids = np.cumsum(roots) - 1
+    labels = np.full((h, w), -1, dtype=np.int32)
+    labels.ravel()[cells] = ids[parent]
+    return labels, int(roots.sum())
+
+class RoomGraph:
+    """Abstract level graph for hierarchical pathfinding.
+    Clusters are the rooms plus each connected stretch of corridor outside them.
+    Nodes are portal cells on both sides of every cluster boundary; edges are
+    either the one-step crossing between two clusters or a precomputed
+    walking distance between two portals of the same cluster."""
+    def __init__(self, grid, rooms):
+        self.rooms = rooms
+        h, w = grid.shape
+        floor = grid == FLOOR
+        cluster = np.full((h, w), -1, dtype=np.int32)
+        for i, r in enumerate(rooms):
+            view = cluster[r.y:r.y+r.h, r.x:r.x+r.w]
+            view[floor[r.y:r.y+r.h, r.x:r.x+r.w]] = i
+        # every other floor cell is corridor: one cluster per connected stretch
+        corridor = floor & (cluster < 0)
+        stretches, count = label_components(np.where(corridor, FLOOR, WALL))
+        cluster[corridor] = stretches[corridor] + len(rooms)
+        count += len(rooms)
+        self.cluster = cluster
+        self.cells = cluster.tolist()
+        self.cluster_count = count
+
+        self.nodes = []          # node index -> cell
+        self.node_of = {}        # cell -> node index
+        self.cluster_nodes = [[] for _ in range(count)]
+        self.edges = []          # node index -> list of (node index, cost)
+
+        # cells of cluster a that touch cluster b, for every touching pair
+        touching = {}
+        padded = np.pad(cluster, 1, constant_values=-1)
+        for dx, dy, _ in STEPS:
+            other = padded[1+dy:1+dy+h, 1+dx:1+dx+w]
+            for y, x in np.argwhere((cluster >= 0) & (other >= 0) & (cluster != other)):
+                touching.setdefault((int(cluster[y, x]), int(other[y, x])), set()).add((int(x), int(y)))
+        for (a, b), cells in touching.items():
+            if a > b:
+                continue
+            cells = sorted(cells)
+            portal = cells[len(cells) // 2]
+            for dx, dy, step in STEPS:
+                across = (portal[0] + dx, portal[1] + dy)
+                if across in touching[(b, a)]:
+                    i, j = self._node(portal), self._node(across)
+                    self.edges[i].append((j, step))
+                    self.edges[j].append((i, step))
+                    break
+
+        # intra-cluster portal-to-portal distances
+        for nodes in self.cluster_nodes:
+            for i in nodes:
+                for j, d in self.distances_from(self.nodes[i]).items():
+                    if j != i:
+                        self.edges[i].append((j, d))
+
+    def _node(self, cell):
+        i = self.node_of.get(cell)
+        if i is None:
+            i = len(self.nodes)
+            self.nodes.append(cell)
+            self.node_of[cell] = i
+            self.cluster_nodes[self.cells[cell[1]][cell[0]]].append(i)
+            self.edges.append([])
+        return i
+
+    def cluster_at(self, cell):
+        return self.cells[cell[1]][cell[0]]
+
+    def distances_from(self, cell):
+        """Walking distance from cell to each portal node of its own cluster,
+        never leaving the cluster. Returns {node index: cost}."""
+        cid = self.cluster_at(cell)
+        if cid < 0:
+            return {}
+        cells = self.cells
+        h, w = len(cells), len(cells[0])
+        dist = {cell: 0.0}
+        heap = [(0.0, cell)]
+        while heap:
+            d, (x, y) = heapq.heappop(heap)
+            if d > dist[(x, y)]:
+                continue
+            for dx, dy, step in STEPS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < w and 0 <= ny < h and cells[ny][nx] == cid:
+                    nd = d + step
+                    if nd < dist.get((nx, ny), float("inf")):
+                        dist[(nx, ny)] = nd
+                        heapq.heappush(heap, (nd, (nx, ny)))
+        return {i: dist[self.nodes[i]] for i in self.cluster_nodes[cid] if self.nodes[i] in dist}
+
+def generate_level(seed=None, level_number=1, with_graph=False, width=GRID_W, height=GRID_H):
+    # room/pillar/guard counts scale with width*height (same density as the
+    # default grid); every draw comes from one NumPy generator, so seed +
+    # level + size reproduce the level bit for bit.
+    # pillars never split the level; runes/guards only go where the start can reach
+    # with_graph=True also returns the RoomGraph built from the rooms
     if seed is not None:
-        random.seed(seed)
-    grid = make_empty_grid()
-    rooms = []
-    max_rooms = 8 + level_number * 2
+        random.seed(seed)  # callers draw guard headings etc. from the global RNG next
+    rng = np.random.default_rng(seed)
+    grid = make_empty_grid(width, height)
+    scale = width * height / (GRID_W * GRID_H)
+    max_rooms = max(1, round((8 + level_number * 2) * scale))
     min_size = 4
     max_size = 9
 
-    for _ in range(max_rooms):
-        w = random.randint(min_size, max_size)
-        h = random.randint(min_size, max_size)
-        x = random.randint(1, GRID_W - w - 2)
-        y = random.randint(1, GRID_H - h - 2)
-        new = Room(x, y, w, h)
-        if any(new.intersect(r) for r in rooms):
+    # every candidate room is drawn up front, then placed in order
+    ws = np.minimum(rng.integers(min_size, max_size + 1, size=max_rooms), width - 3)
+    hs = np.minimum(rng.integers(min_size, max_size + 1, size=max_rooms), height - 3)
+    xs = rng.integers(1, width - ws - 1)
+    ys = rng.integers(1, height - hs - 1)
+    flips = rng.random(max_rooms) < 0.5
+    # placed rooms plus a one-cell margin: a candidate overlapping this mask
+    # is exactly one that Room.intersect() rejects
+    taken = np.zeros((height, width), dtype=bool)
+    rooms = []
+    for x, y, w, h in zip(xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist()):
+        if taken[y:y+h, x:x+w].any():
             continue
-        carve_room(grid, new)
-        if rooms:
-            (x1, y1) = new.center()
-            (x2, y2) = rooms[-1].center()
-            if random.random() < 0.5:
-                carve_h(grid, x1, x2, y1); carve_v(grid, y1, y2, x2)
-            else:
-                carve_v(grid, y1, y2, x1); carve_h(grid, x1, x2, y2)
-        rooms.append(new)
-
-    # sprinkle pillars
-    tries = 40 + level_number * 10
-    for _ in range(tries):
-        rx = random.randint(1, GRID_W-2)
-        ry = random.randint(1, GRID_H-2)
-        if grid[ry, rx] == FLOOR and random.random() < 0.08:
-            grid[ry, rx] = WALL
+        taken[y-1:y+h+1, x-1:x+w+1] = True
+        rooms.append(Room(x, y, w, h))
+        carve_room(grid, rooms[-1])
 
+    # connect every room to the nearest (Manhattan, centre to centre) room
+    # placed before it; distances are taken a block of rooms at a time
+    cx = np.array([r.center()[0] for r in rooms], dtype=np.int32)
+    cy = np.array([r.center()[1] for r in rooms], dtype=np.int32)
+    nearest = [0] * len(rooms)
+    later = np.triu(np.ones((256, 256), dtype=bool))  # rooms at or after the row's own
+    for lo in range(1, len(rooms), 256):
+        hi = min(lo + 256, len(rooms))
+        d = np.abs(cx[lo:hi, None] - cx[None, :hi])
+        d += np.abs(cy[lo:hi, None] - cy[None, :hi])
+        d[:, lo:hi][later[:hi-lo, :hi-lo]] = np.iinfo(np.int32).max
+        nearest[lo:hi] = d.argmin(axis=1).tolist()
+    cx, cy = cx.tolist(), cy.tolist()
+    for i in range(1, len(rooms)):
+        (x1, y1) = cx[i], cy[i]
+        (x2, y2) = cx[nearest[i]], cy[nearest[i]]
+        if flips[i]:
+            carve_h(grid, x1, x2, y1)
+            carve_v(grid, y1, y2, x2)
+        else:
+            carve_v(grid, y1, y2, x1)
+            carve_h(grid, x1, x2, y2)
+
+    # choose player start at center of first room
     start_room = rooms[0] if rooms else Room(1,1,5,5)
     player_cell = start_room.center()
 
-    # runes in rooms
+    # sprinkle some pillars/walls randomly inside floors to add complexity,
+    # never on the start cell
+    tries = max(1, round((40 + level_number * 10) * scale))
+    px = rng.integers(1, width - 1, size=tries)
+    py = rng.integers(1, height - 1, size=tries)
+    hit = (grid[py, px] == FLOOR) & (rng.random(tries) < 0.08)
+    hit &= (px != player_cell[0]) | (py != player_cell[1])
+    grid[py[hit], px[hit]] = WALL
+
+    # a pillar must not cut the level apart: put back every pillar touching a
+    # floor region the start can no longer reach, until one region is left
+    pillars = np.zeros((height, width), dtype=bool)
+    pillars[py[hit], px[hit]] = True
+    labels, count = label_components(grid)
+    while count > 1:
+        cut_off = (labels >= 0) & (labels != labels[player_cell[1], player_cell[0]])
+        padded = np.pad(cut_off, 1)
+        near = np.zeros_like(cut_off)
+        for dx, dy, _ in STEPS:
+            near |= padded[1+dy:1+dy+height, 1+dx:1+dx+width]
+        back = pillars & near
+        if not back.any():
+            break
+        grid[back] = FLOOR
+        pillars &= ~back
+        labels, count = label_components(grid)
+    # runes and guards only go where the start can walk to
+    home = labels == labels[player_cell[1], player_cell[0]]
+
+    # spawn runes scattered in other rooms, one random cell per room
     runes = []
-    for r in rooms[1:]:
-        rx = random.randint(r.x, r.x + r.w - 1)
-        ry = random.randint(r.y, r.y + r.h - 1)
-        if grid[ry, rx] == FLOOR:
-            runes.append((rx, ry))
-
-    # guard spawns
-    guards = []
-    guard_count = max(1, level_number + 1)
-    placed = 0
-    attempts = 0
-    while placed < guard_count and attempts < 800:
-        gx = random.randint(1, GRID_W-2)
-        gy = random.randint(1, GRID_H-2)
-        attempts += 1
-        if grid[gy, gx] == FLOOR and (gx, gy) != player_cell and (gx, gy) not in runes:
-            guards.append((gx, gy)); placed += 1
+    if len(rooms) > 1:
+        rx0 = np.array([r.x for r in rooms[1:]])
+        ry0 = np.array([r.y for r in rooms[1:]])
+        rx = rng.integers(rx0, rx0 + np.array([r.w for r in rooms[1:]]))
+        ry = rng.integers(ry0, ry0 + np.array([r.h for r in rooms[1:]]))
+        keep = home[ry, rx]
+        runes = list(zip(rx[keep].tolist(), ry[keep].tolist()))
+
+    # guard spawns - more as level increases; distinct reachable cells that
+    # are neither the start nor a rune
+    free = home.copy()
+    free[player_cell[1], player_cell[0]] = False
+    for (rx, ry) in runes:
+        free[ry, rx] = False
+    cells = np.flatnonzero(free)
+    guard_count = min(max(1, round((level_number + 1) * scale)), len(cells))
+    guards = [(i % width, i // width) for i in rng.choice(cells, size=guard_count, replace=False).tolist()]
 
+    if with_graph:
+        return grid, player_cell, runes, guards, RoomGraph(grid, rooms)
     return grid, player_cell, runes, guards
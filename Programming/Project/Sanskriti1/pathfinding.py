@@ -2,7 +2,15 @@
 # A* on grid
 import heapq
 import math
-from settings3d import ORTHO_COST, DIAG_COST
+import time
+from collections import OrderedDict
+import numpy as np
+from settings3d import ORTHO_COST, DIAG_COST, PATH_ENGINE
+from mapgen import label_components
+import perf
+
+# neighbour offsets (dx, dy), in the order neighbors() visits them
+OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
 
 def neighbors(cell, grid):
     x, y = cell
@@ -22,23 +30,64 @@ def neighbors(cell, grid):
 def heuristic(a, b):
     return math.hypot(b[0]-a[0], b[1]-a[1])
 
-def astar(grid, start, goal, max_nodes=10000):
+def octile(a, b):
+    # exact 8-connected distance on an empty grid (admissible)
+    dx = abs(b[0]-a[0]); dy = abs(b[1]-a[1])
+    return ORTHO_COST*(dx+dy) + (DIAG_COST - 2*ORTHO_COST)*min(dx, dy)
+
+class SearchStats:
+    """What one astar() call did. Pass one in as stats= to have it filled in;
+    a single instance can be reused across calls."""
+    __slots__ = ("expanded", "rejected", "truncated", "partial", "length", "elapsed")
+
+    def __init__(self):
+        self.expanded = 0       # nodes taken off the open list
+        self.rejected = None    # "wall" / "unreachable": goal turned down before searching
+        self.truncated = False  # gave up after max_nodes expansions
+        self.partial = False    # path ends at the closest cell reached, not at the goal
+        self.length = 0         # cells in the returned path
+        self.elapsed = 0.0      # seconds, filled in by astar()
+
+    def record(self, expanded, path, rejected=None, truncated=False, partial=False):
+        """Store the outcome of a search and hand the path back."""
+        self.expanded = expanded
+        self.rejected = rejected
+        self.truncated = truncated
+        self.partial = partial and bool(path)
+        self.length = len(path)
+        return path
+
+_scratch = SearchStats()  # filled in when the caller did not ask for stats
+
+def _walk_back(came, cur):
+    path = [cur]
+    while cur in came:
+        cur = came[cur]
+        path.append(cur)
+    return list(reversed(path))
+
+def astar_dict(grid, start, goal, max_nodes=10000, partial=False, stats=None):
+    # original tuple/dict A*; no region labels, so only wall goals are turned down up front
+    # (with partial it searches anyway and ends next to the wall)
+    stats = stats or _scratch
     if start == goal:
-        return [start]
+        return stats.record(0, [start])
+    rejected = "wall" if grid[goal[1], goal[0]] != 0 else None
+    if rejected and not partial:
+        return stats.record(0, [], rejected=rejected)
     open_set = []
     heapq.heappush(open_set, (heuristic(start, goal), 0, start))
     came = {}
     g = {start: 0}
     nodes = 0
+    best_h, best = float("inf"), start  # closest cell expanded, for partial paths
     while open_set:
-        _, cost, cur = heapq.heappop(open_set)
+        f, cost, cur = heapq.heappop(open_set)
         nodes += 1
         if cur == goal:
-            path = [cur]
-            while cur in came:
-                cur = came[cur]
-                path.append(cur)
-            return list(reversed(path))
+            return stats.record(nodes, _walk_back(came, cur))
+        if f - cost < best_h:
+            best_h, best = f - cost, cur
         for nxt, move_cost in neighbors(cur, grid):
             new_cost = cost + move_cost
             if nxt not in g or new_cost < g[nxt]:
@@ -47,4 +96,296 @@ def astar(grid, start, goal, max_nodes=10000):
                 heapq.heappush(open_set, (new_cost + heuristic(nxt, goal), new_cost, nxt))
         if nodes > max_nodes:
             break
-    return []
+    return stats.record(nodes, _walk_back(came, best) if partial else [], rejected,
+                        truncated=nodes > max_nodes, partial=partial)
+
+class GridSearch:
+    """A* over flat cell indices (y * w + x) for one grid.
+    The walkable-neighbour table is built once with NumPy; the g-cost, parent
+    and closed buffers are allocated once and reset between calls by bumping
+    a stamp instead of clearing them."""
+    def __init__(self, grid):
+        h, w = grid.shape
+        n = h * w
+        self.grid = grid
+        self.w = w
+        walkable = np.pad(grid == 0, 1, constant_values=False)
+        index = np.arange(n).reshape(h, w)
+        table = np.stack([np.where(walkable[1+dy:1+dy+h, 1+dx:1+dx+w], index + dy * w + dx, -1).ravel()
+                          for dx, dy in OFFSETS], axis=1)
+        costs = [DIAG_COST if dx and dy else ORTHO_COST for dx, dy in OFFSETS]
+        # per cell: tuple of (neighbour index, step cost) for walkable neighbours only
+        self.neighbors = [tuple((j, costs[k]) for k, j in enumerate(row) if j >= 0)
+                          for row in table.tolist()]
+        # plain lists rather than ndarrays: scalar reads/writes in the inner
+        # loop are about twice as fast on lists
+        self.g = [0.0] * n
+        self.parent = [-1] * n
+        self.seen = [0] * n
+        self.closed = [0] * n
+        self.stamp = 0
+        # walkable flags with a one-cell wall border, indexed (y + 1) * (w + 2) + (x + 1),
+        # so jump point search can probe off the edge without bounds checks
+        self.open = walkable.ravel().tolist()
+        # connected floor region per cell (-1 on walls), so a goal the start
+        # cannot reach is turned down before anything is expanded
+        self.labels = label_components(grid)[0]
+        self.region = self.labels.ravel().tolist()
+
+    def unreachable(self, src, dst):
+        """Why dst cannot be reached from src ("wall" / "unreachable"), or None.
+        A start inside a wall still steps out to its floor neighbours, so
+        only a floor start pins the region."""
+        region = self.region
+        if region[dst] < 0:
+            return "wall"
+        if region[src] >= 0 and region[src] != region[dst]:
+            return "unreachable"
+        return None
+
+    def nearest(self, src, goal):
+        """Cell of src's region closest to goal in a straight line, to head
+        for instead of a goal that cannot be reached."""
+        region = self.region[src]
+        ys, xs = np.nonzero(self.labels == region if region >= 0 else self.labels >= 0)
+        k = int(np.argmin((xs - goal[0]) ** 2 + (ys - goal[1]) ** 2))
+        return (int(xs[k]), int(ys[k]))
+
+    def search(self, start, goal, max_nodes=10000, partial=False, stats=None):
+        """Same contract as astar(): list of cells from start to goal, or []."""
+        stats = stats or _scratch
+        if start == goal:
+            return stats.record(0, [start])
+        w = self.w
+        src = start[1] * w + start[0]
+        dst = goal[1] * w + goal[0]
+        rejected = self.unreachable(src, dst)
+        if rejected:
+            if not partial:
+                return stats.record(0, [], rejected=rejected)
+            # best effort: the path to the reachable cell closest to the goal
+            path = self.search(start, self.nearest(src, goal), max_nodes, partial, stats)
+            return stats.record(stats.expanded, path, rejected, stats.truncated, partial=True)
+        gx, gy = goal
+        diag = DIAG_COST - 2 * ORTHO_COST
+        self.stamp += 1
+        stamp = self.stamp
+        g, parent, seen, closed, neighbors = self.g, self.parent, self.seen, self.closed, self.neighbors
+        g[src] = 0.0
+        parent[src] = -1
+        seen[src] = stamp
+        open_set = [(octile(start, goal), 0.0, src)]
+        push, pop = heapq.heappush, heapq.heappop
+        nodes = 0
+        best_h, best = float("inf"), src  # expanded cell closest to the goal, for partial paths
+        while open_set:
+            f, cost, current = pop(open_set)
+            if closed[current] == stamp:
+                continue  # stale entry, a cheaper copy was already expanded
+            closed[current] = stamp
+            if current == dst:
+                return stats.record(nodes, self._trace(current))
+            if f - cost < best_h:
+                best_h, best = f - cost, current
+            nodes += 1
+            if nodes > max_nodes:
+                break
+            for nxt, step in neighbors[current]:
+                if closed[nxt] == stamp:
+                    continue
+                new_cost = cost + step
+                if seen[nxt] != stamp or new_cost < g[nxt]:
+                    g[nxt] = new_cost
+                    parent[nxt] = current
+                    seen[nxt] = stamp
+                    dx = abs(nxt % w - gx)
+                    dy = abs(nxt // w - gy)
+                    h = ORTHO_COST * (dx + dy) + diag * (dx if dx < dy else dy)
+                    push(open_set, (new_cost + h, new_cost, nxt))
+        return stats.record(nodes, self._trace(best) if partial else [],
+                            truncated=nodes > max_nodes, partial=partial)
+
+    def _trace(self, current):
+        # follow parent links back to the start
+        w = self.w
+        path = []
+        while current != -1:
+            path.append((current % w, current // w))
+            current = self.parent[current]
+        path.reverse()
+        return path
+
+    def _jump(self, x, y, dx, dy, goal):
+        """Walk from (x, y) in direction (dx, dy) and return the first jump point, or None."""
+        walk = self.open
+        row = self.w + 2
+        gp = (goal[1] + 1) * row + goal[0] + 1
+        step = dy * row + dx
+        p = (y + 1) * row + x + 1
+        while True:
+            p += step
+            x += dx
+            y += dy
+            if not walk[p]:
+                return None
+            if p == gp:
+                return (x, y)
+            if dx and dy:
+                # forced neighbour behind a corner on either side
+                if (walk[p - dx + dy * row] and not walk[p - dx]) or \
+                   (walk[p + dx - dy * row] and not walk[p - dy * row]):
+                    return (x, y)
+                if self._jump(x, y, dx, 0, goal) or self._jump(x, y, 0, dy, goal):
+                    return (x, y)
+            elif dx:
+                if (walk[p + dx + row] and not walk[p + row]) or \
+                   (walk[p + dx - row] and not walk[p - row]):
+                    return (x, y)
+            else:
+                if (walk[p + 1 + dy * row] and not walk[p + 1]) or \
+                   (walk[p - 1 + dy * row] and not walk[p - 1]):
+                    return (x, y)
+
+    def _pruned_dirs(self, x, y, dx, dy):
+        """Directions worth jumping in after arriving at (x, y) moving (dx, dy)."""
+        if dx == 0 and dy == 0:
+            return OFFSETS
+        walk = self.open
+        row = self.w + 2
+        p = (y + 1) * row + x + 1
+        if dx and dy:
+            dirs = [(0, dy), (dx, 0), (dx, dy)]
+            if not walk[p - dx]:
+                dirs.append((-dx, dy))
+            if not walk[p - dy * row]:
+                dirs.append((dx, -dy))
+        elif dx:
+            dirs = [(dx, 0)]
+            if not walk[p + row]:
+                dirs.append((dx, 1))
+            if not walk[p - row]:
+                dirs.append((dx, -1))
+        else:
+            dirs = [(0, dy)]
+            if not walk[p + 1]:
+                dirs.append((1, dy))
+            if not walk[p - 1]:
+                dirs.append((-1, dy))
+        return dirs
+
+    def jps(self, start, goal, max_nodes=10000, partial=False, stats=None):
+        """Jump point search over the same 8-connected moves as search().
+        Only jump points go on the open list; the result is expanded back
+        into the usual cell-by-cell path."""
+        stats = stats or _scratch
+        if start == goal:
+            return stats.record(0, [start])
+        w = self.w
+        src = start[1] * w + start[0]
+        rejected = self.unreachable(src, goal[1] * w + goal[0])
+        if rejected:
+            if not partial:
+                return stats.record(0, [], rejected=rejected)
+            path = self.jps(start, self.nearest(src, goal), max_nodes, partial, stats)
+            return stats.record(stats.expanded, path, rejected, stats.truncated, partial=True)
+        self.stamp += 1
+        stamp = self.stamp
+        g, parent, seen, closed = self.g, self.parent, self.seen, self.closed
+        g[src] = 0.0
+        parent[src] = -1
+        seen[src] = stamp
+        open_set = [(octile(start, goal), 0.0, start, 0, 0)]
+        nodes = 0
+        best_h, best = float("inf"), src  # jump point closest to the goal, for partial paths
+        while open_set:
+            f, cost, cell, pdx, pdy = heapq.heappop(open_set)
+            x, y = cell
+            current = y * w + x
+            if closed[current] == stamp:
+                continue
+            closed[current] = stamp
+            if cell == goal:
+                return stats.record(nodes, self._expand(current))
+            if f - cost < best_h:
+                best_h, best = f - cost, current
+            nodes += 1
+            if nodes > max_nodes:
+                break
+            for dx, dy in self._pruned_dirs(x, y, pdx, pdy):
+                jp = self._jump(x, y, dx, dy, goal)
+                if jp is None:
+                    continue
+                nxt = jp[1] * w + jp[0]
+                if closed[nxt] == stamp:
+                    continue
+                new_cost = cost + octile(cell, jp)
+                if seen[nxt] != stamp or new_cost < g[nxt]:
+                    g[nxt] = new_cost
+                    parent[nxt] = current
+                    seen[nxt] = stamp
+                    heapq.heappush(open_set, (new_cost + octile(jp, goal), new_cost, jp, dx, dy))
+        return stats.record(nodes, self._expand(best) if partial else [],
+                            truncated=nodes > max_nodes, partial=partial)
+
+    def _expand(self, current):
+        # parent links join jump points along straight or diagonal runs
+        points = self._trace(current)
+        path = [points[0]]
+        for tx, ty in points[1:]:
+            x, y = path[-1]
+            dx = (tx > x) - (tx < x)
+            dy = (ty > y) - (ty < y)
+            while (x, y) != (tx, ty):
+                x += dx
+                y += dy
+                path.append((x, y))
+        return path
+
+_searches = OrderedDict()
+
+def grid_search(grid):
+    """Cached GridSearch for grid. Edits to the grid's contents are not
+    looked for here, per query: call grid_changed() after making one
+    (PathService and FlowField do, from their once-per-frame checks)."""
+    key = id(grid)
+    engine = _searches.get(key)
+    if engine is None or engine.grid is not grid:
+        engine = GridSearch(grid)
+        _searches[key] = engine
+        if len(_searches) > 4:
+            _searches.popitem(last=False)
+    return engine
+
+def grid_changed(grid):
+    """Drop the cached GridSearch for grid; the next query rebuilds it."""
+    engine = _searches.get(id(grid))
+    if engine is not None and engine.grid is grid:
+        del _searches[id(grid)]
+
+def jps(grid, start, goal, max_nodes=10000, partial=False, stats=None):
+    """Jump point search: same contract as astar(), far fewer expansions
+    across open rooms."""
+    return grid_search(grid).jps(start, goal, max_nodes, partial, stats)
+
+def astar(grid, start, goal, max_nodes=10000, partial=False, stats=None):
+    """Return path as list of cells from start to goal, or [] if none.
+    Goals off the grid, in a wall or in another connected region are turned
+    down before anything is expanded. partial=True returns a best-effort path
+    instead of []: toward the reachable cell closest to a goal in a wall or
+    another region, or to the closest cell reached when max_nodes runs out.
+    stats (a SearchStats) is filled in with what the call did.
+    The engine is picked by settings.PATH_ENGINE."""
+    stats = stats or _scratch
+    with perf.scope("astar"):
+        t0 = time.perf_counter()
+        h, w = grid.shape
+        if not (0 <= goal[0] < w and 0 <= goal[1] < h):
+            path = stats.record(0, [], rejected="wall")
+        elif PATH_ENGINE == "jps":
+            path = grid_search(grid).jps(start, goal, max_nodes, partial, stats)
+        elif PATH_ENGINE == "array":
+            path = grid_search(grid).search(start, goal, max_nodes, partial, stats)
+        else:
+            path = astar_dict(grid, start, goal, max_nodes, partial, stats)
+        stats.elapsed = time.perf_counter() - t0
+        return path
@@ -0,0 +1,126 @@
+# perf.py
+# Lightweight per-frame profiling: named timing scopes summed per frame, a
+# rolling window of frames for the overlay, and CSV/JSON trace dumps.
+#   with perf.scope("astar"):
+#       ...
+#   perf.end_frame()  # once per frame
+# While disabled, scope() hands back one shared no-op object.
+import csv
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from settings3d import PROFILE, PROFILE_FRAMES, PROFILE_DIR
+
+enabled = PROFILE
+frames = deque(maxlen=PROFILE_FRAMES)  # (frame_ms, {scope: (ms, calls)}) per frame
+_current = {}  # scope -> [seconds, calls] for the frame in progress
+_last_end = None
+_clock = time.perf_counter
+
+class _Scope:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = _clock()
+
+    def __exit__(self, *exc):
+        elapsed = _clock() - self.t0
+        entry = _current.get(self.name)
+        if entry is None:
+            _current[self.name] = [elapsed, 1]
+        else:
+            entry[0] += elapsed
+            entry[1] += 1
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL = _NullScope()
+
+def scope(name):
+    return _Scope(name) if enabled else _NULL
+
+def set_enabled(on):
+    """Turn profiling on/off; turning it on starts a fresh window."""
+    global enabled, _last_end
+    enabled = on
+    frames.clear()
+    _current.clear()
+    _last_end = None
+
+def toggle():
+    set_enabled(not enabled)
+    return enabled
+
+def end_frame():
+    """Close the current frame: its scope totals join the rolling window."""
+    global _last_end
+    if not enabled:
+        return
+    now = _clock()
+    frame_ms = (now - _last_end) * 1000.0 if _last_end is not None else 0.0
+    _last_end = now
+    frames.append((frame_ms, {name: (t * 1000.0, calls) for name, (t, calls) in _current.items()}))
+    _current.clear()
+
+# histogram bucket upper edges in ms; the last bucket is open-ended
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33)
+
+def summary():
+    """Per scope over the window: mean/p50/p95/max ms per frame, calls per
+    frame and a histogram over BUCKETS_MS. Sorted by mean, slowest first;
+    "frame" is the wall time between end_frame() calls."""
+    if not frames:
+        return []
+    names = {"frame"}
+    for _, scopes in frames:
+        names.update(scopes)
+    rows = []
+    for name in names:
+        if name == "frame":
+            ms = np.array([f[0] for f in frames])
+            calls = np.ones(len(frames))
+        else:
+            ms = np.array([s.get(name, (0.0, 0))[0] for _, s in frames])
+            calls = np.array([s.get(name, (0.0, 0))[1] for _, s in frames])
+        hist = np.bincount(np.searchsorted(BUCKETS_MS, ms), minlength=len(BUCKETS_MS) + 1)
+        rows.append({"scope": name, "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+                     "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max()),
+                     "calls": float(calls.mean()), "histogram": hist.tolist()})
+    rows.sort(key=lambda r: r["mean_ms"], reverse=True)
+    return rows
+
+def dump(path=None):
+    """Write the window to path (.csv: one row per frame and scope; .json:
+    frames plus summary). Defaults to a timestamped JSON file in PROFILE_DIR."""
+    if path is None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, time.strftime("trace_%Y%m%d_%H%M%S.json"))
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "scope", "ms", "calls"])
+            for i, (frame_ms, scopes) in enumerate(frames):
+                writer.writerow([i, "frame", f"{frame_ms:.4f}", 1])
+                for name, (ms, calls) in scopes.items():
+                    writer.writerow([i, name, f"{ms:.4f}", calls])
+    else:
+        trace = {"buckets_ms": list(BUCKETS_MS),
+                 "summary": summary(),
+                 "frames": [{"frame_ms": frame_ms, "scopes": scopes} for frame_ms, scopes in frames]}
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=1)
+    return path
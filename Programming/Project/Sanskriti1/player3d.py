@@ -1,16 +1,22 @@
 # player3d.py
-from ursina import Entity, Vec3, color, time, held_keys
+from collections import namedtuple
+
 from settings3d import (TILE_SIZE, PLAYER_SPEED, PLAYER_SPRINT_MULT,
-                        PLAYER_MAX_STAMINA, PLAYER_STAMINA_DRAIN, PLAYER_STAMINA_RECOVER,
-                        COLOR_PLAYER)
+                        PLAYER_MAX_STAMINA, PLAYER_STAMINA_DRAIN, PLAYER_STAMINA_RECOVER)
 from utils3d import clamp, to_grid_from_world
 
-class Player(Entity):
+# one frame of player input on the XZ plane: move_x/move_z in -1..1, sprint held
+Inputs = namedtuple("Inputs", "move_x move_z sprint")
+IDLE = Inputs(0, 0, False)
+
+class Player:
+    """Player state on the XZ plane, in world units. No Ursina here:
+    main_ursina draws an entity wherever (x, z) says."""
+    __slots__ = ("x", "z", "speed", "sprinting", "stamina", "score", "alive")
+
     def __init__(self, start_cell):
-        x = start_cell[0] * TILE_SIZE
-        z = start_cell[1] * TILE_SIZE
-        super().__init__(model='capsule', color=color.rgba(*COLOR_PLAYER),
-                         scale=Vec3(0.6, 1.1, 0.6), position=Vec3(x, 0.55, z))
+        self.x = start_cell[0] * TILE_SIZE
+        self.z = start_cell[1] * TILE_SIZE
         self.speed = PLAYER_SPEED
         self.sprinting = False
         self.stamina = PLAYER_MAX_STAMINA
@@ -36,15 +42,10 @@ class Player(Entity):
             self.x = new_x
             self.z = new_z
 
-    def update_logic(self, grid):
-        dt = time.dt
-        vx = vz = 0.0
-        # WASD on XZ plane
-        if held_keys['w']: vz += 1
-        if held_keys['s']: vz -= 1
-        if held_keys['a']: vx -= 1
-        if held_keys['d']: vx += 1
-        self.sprinting = held_keys['shift']
+    def update(self, dt, grid, inputs=IDLE):
+        vx = float(inputs.move_x)
+        vz = float(inputs.move_z)
+        self.sprinting = bool(inputs.sprint)
         spd = self.speed * (PLAYER_SPRINT_MULT if (self.sprinting and self.stamina > 0) else 1.0)
 
         # normalize
@@ -0,0 +1,35 @@
+# pool.py
+# Recycles Ursina entities across build_level calls instead of destroy/recreate
+
+class EntityPool:
+    """Entities handed out by acquire() are created with factory(*args) the first
+    time and recycled through reset(entity, *args) afterwards. release() just
+    disables an entity, so no Panda3D nodes are created or freed at level
+    transitions once the pool is warm."""
+    def __init__(self, factory, reset):
+        self.factory = factory
+        self.reset = reset
+        self.free = []
+        self.active = []
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            entity = self.free.pop()
+            self.reset(entity, *args, **kwargs)
+            entity.enabled = True
+        else:
+            entity = self.factory(*args, **kwargs)
+        self.active.append(entity)
+        return entity
+
+    def release(self, entity):
+        if entity in self.active:
+            self.active.remove(entity)
+            entity.enabled = False
+            self.free.append(entity)
+
+    def release_all(self):
+        for entity in self.active:
+            entity.enabled = False
+        self.free.extend(self.active)
+        self.active = []
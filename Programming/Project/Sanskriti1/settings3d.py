@@ -1,15 +1,24 @@
 # settings3d.py
 # Global config for the 3D Ursina build
+import os
 
 # World/grid
 TILE_SIZE = 1.0               # 1 unit per tile (meters)
 GRID_W = 30                   # columns
 GRID_H = 22                   # rows
 
+# Simulation clock
+SIM_DT = 1.0 / 60             # fixed logic step in seconds; rendering interpolates between steps
+MAX_FRAME_DT = 0.25           # seconds; longer frames (hitches) are clamped to this
+MAX_SIM_STEPS = 5             # logic steps per rendered frame at most; any backlog beyond is dropped
+
 # Camera
 CAM_HEIGHT = 22               # top-down / angled camera height
 CAM_TILT_DEG = 57             # camera pitch angle
 
+# Level geometry
+MESH_CHUNK = 16               # tiles per side of each merged floor/wall mesh
+
 # Player
 PLAYER_SPEED = 3.8            # tiles per second
 PLAYER_SPRINT_MULT = 1.8
@@ -22,10 +31,36 @@ GUARD_SPEED = 2.8             # tiles per second baseline
 GUARD_VISION_DISTANCE = 7.0   # tiles
 GUARD_FOV_DEG = 70            # for LOS + visual cone scaling
 GUARD_HEARING_RADIUS = 3      # tiles (reserved for future)
+GUARD_MEMORY = 8              # recent player cells a boss remembers for its prediction
+PLAYER_HISTORY = 20           # recent player cells handed to the guards each frame
+
+# Guard AI level of detail (see lod.py)
+AI_LOD = True                 # calm guards away from the player think at a reduced rate
+AI_NEAR_RADIUS = 12           # tiles; keep above the largest regular guard vision
+AI_FAR_INTERVAL = 4           # frames between thinks for the other guards
 
 # Pathfinding cost
 ORTHO_COST = 1.0
 DIAG_COST = 1.4
+PATH_CACHE_SIZE = 256         # memoized (start, goal) paths per level
+PATH_REPLAN_BUDGET = 4        # fresh A* searches allowed per frame
+PATH_ENGINE = "array"         # "array" (flat-index A*), "jps" (jump points) or "dict" (original A*)
+HIERARCHICAL_PATHS = False    # plan guard routes room-to-room over mapgen's RoomGraph
+
+# Line of sight
+LOS_TABLE = True              # precompute cell-to-cell LOS bitsets at level load
+LOS_TABLE_RADIUS = 12         # tiles; farther pairs fall back to los_grid
+LOS_CACHE_DIR = None          # directory for LOS tables on disk; levels use fresh random seeds, so off
+LOS_CACHE_ENTRIES = 32        # tables kept on disk when enabled; least recently used go first
+
+# Profiling (F3 toggles the overlay, F4 dumps a trace)
+PROFILE = False               # start with timing scopes enabled
+PROFILE_FRAMES = 300          # rolling window of frames kept for the overlay and dumps
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# Proximity queries
+SPATIAL_BUCKET = 4            # side of a spatial hash bucket, in tiles
+CATCH_RADIUS = 0.55           # world units; a guard this close catches the player
 
 # Runes and scoring
 RUNE_SCORE = 100
@@ -0,0 +1,190 @@
+# sim3d.py
+# Engine-free game core for the 3D build: one level's grid, player, guards
+# and runes on the XZ plane in world units, advanced by a fixed-timestep
+# step(). No Ursina import - main_ursina.py feeds it the keys and copies its
+# positions onto entities, and it runs headless for batch tests, AI tuning
+# and benchmarks. Same interface as the 2D build's sim.py, with the 3D rules.
+import math
+import os
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from settings3d import (TILE_SIZE, RUNE_SCORE, LEVEL_COUNT, HIERARCHICAL_PATHS, SIM_DT, CATCH_RADIUS,
+                        PLAYER_HISTORY, GUARD_SPEED, GUARD_VISION_DISTANCE)
+from settings3d import LOS_TABLE, LOS_TABLE_RADIUS, LOS_CACHE_DIR, LOS_CACHE_ENTRIES
+from mapgen import generate_level, label_components
+from player3d import Player, Inputs, IDLE
+from guard3d import Guard, guards_see_player, STATE_PATROL
+from pathcache import PathService
+from flowfield import FlowField
+from hpa import HierarchicalPlanner
+from spatial import SpatialHash
+from lod import AIScheduler
+from utils3d import LosTable
+import perf
+
+class Simulation:
+    """A single level. Same seed + same input sequence -> same state, tick for
+    tick: the clock is the tick count, never the wall clock."""
+    __slots__ = ("seed", "level_num", "grid", "start_cell", "runes", "player", "paths", "flow", "los",
+                 "guards", "guard_index", "ai", "player_history", "tick", "time", "complete")
+
+    def __init__(self, seed, level_num=1, los_cache_dir=LOS_CACHE_DIR):
+        self.seed = seed
+        self.level_num = level_num
+        # generate_level seeds the global RNG; the extra runes below and the
+        # guards' patrol picks draw from it, so they follow the seed too
+        grid, start_cell, rune_cells, guard_spawns, room_graph = generate_level(seed=seed, level_number=level_num,
+                                                                             with_graph=True)
+        self.grid = grid
+        self.start_cell = start_cell
+        h, w = grid.shape
+        self.player = Player(start_cell)
+        if HIERARCHICAL_PATHS:
+            self.paths = PathService(grid, search=HierarchicalPlanner(room_graph).find_path)
+        else:
+            self.paths = PathService(grid)
+        self.flow = FlowField(grid)
+        if LOS_TABLE:
+            self.los = LosTable.load_or_build(grid, seed, level_num, LOS_TABLE_RADIUS, los_cache_dir, LOS_CACHE_ENTRIES)
+        else:
+            self.los = None
+
+        # ensure at least 3 runes, all reachable from the start
+        self.runes = set(rune_cells)  # uncollected rune cells
+        labels, _ = label_components(grid)
+        home = labels[start_cell[1], start_cell[0]]
+        while len(self.runes) < 3:
+            rx = random.randint(1, w-2); ry = random.randint(1, h-2)
+            if labels[ry, rx] == home and (rx, ry) != start_cell:
+                self.runes.add((rx, ry))
+
+        self.guards = []
+        for sp in guard_spawns:
+            g = Guard(sp, grid, is_boss=False, paths=self.paths, flow=self.flow, los_table=self.los)
+            # scale difficulty per level
+            g.speed = GUARD_SPEED * (1.0 + 0.08*level_num)
+            g.vision_dist = GUARD_VISION_DISTANCE + 0.5 * level_num
+            self.guards.append(g)
+        # Final boss on last level
+        if level_num == LEVEL_COUNT:
+            # place boss near farthest walkable (reachable) cell
+            far_d = -1; target = (0,0)
+            for y in range(h):
+                for x in range(w):
+                    if labels[y,x]==home:
+                        d = (x - start_cell[0])**2 + (y - start_cell[1])**2
+                        if d > far_d: far_d = d; target = (x,y)
+            boss = Guard(target, grid, is_boss=True, paths=self.paths, flow=self.flow, los_table=self.los)
+            boss.speed = GUARD_SPEED * (1.1 + 0.1*level_num)
+            self.guards.append(boss)
+        # guards by index, for proximity checks
+        self.guard_index = SpatialHash()
+        for i, g in enumerate(self.guards):
+            self.guard_index.insert(i, g.cell)
+        self.ai = AIScheduler()  # which guards think each tick
+
+        self.player_history = deque(maxlen=PLAYER_HISTORY)
+        self.tick = 0
+        self.time = 0.0  # seconds of simulated play; the guards' clock
+        self.complete = False
+
+    @property
+    def over(self):
+        return self.complete or not self.player.alive
+
+    def step(self, inputs=IDLE, dt=SIM_DT):
+        """Advance one tick: movement, guards, runes. inputs is a player3d.Inputs."""
+        if self.over:
+            return
+        self.tick += 1
+        self.time += dt
+        player, guards = self.player, self.guards
+        self.paths.begin_frame()
+        self.flow.begin_frame()
+        # Update player movement & stamina
+        with perf.scope("player.update"):
+            player.update(dt, self.grid, inputs)
+        self.player_history.append(player.cell)
+        # Guards: the scheduler picks who thinks this tick, one batched
+        # visibility pass over those, then the per-guard state machines
+        think = self.ai.plan([g.cell for g in guards], player.cell,
+                             [g.is_boss or g.state != STATE_PATROL for g in guards])
+        thinking = np.flatnonzero(think)
+        seen = np.zeros(len(guards), dtype=bool)
+        with perf.scope("perception"):
+            if len(thinking):
+                seen[thinking] = guards_see_player([guards[i] for i in thinking], self.grid, player, self.los)
+        for i, g in enumerate(guards):
+            with perf.scope("guard.update"):
+                g.update(dt, player, self.player_history, seen=bool(seen[i]), now=self.time, think=bool(think[i]))
+            self.guard_index.move(i, g.cell)
+        # Rune collection
+        if player.cell in self.runes:
+            player.score += RUNE_SCORE
+            self.runes.discard(player.cell)
+        if self.caught():
+            player.alive = False
+        elif not self.runes:
+            self.complete = True
+
+    def caught(self):
+        # If a guard is close enough in world space; only guards in the
+        # neighbouring buckets are looked at
+        player = self.player
+        reach = math.ceil(CATCH_RADIUS / TILE_SIZE)
+        for i in self.guard_index.near(player.cell, reach):
+            g = self.guards[i]
+            dx = g.x - player.x
+            dz = g.z - player.z
+            if (dx*dx + dz*dz) ** 0.5 < CATCH_RADIUS:
+                return True
+        return False
+
+    def positions(self):
+        """World (x, z) of the player and then the guards, as an n x 2 array;
+        the renderer blends two of these between steps."""
+        return np.array([(self.player.x, self.player.z)] + [(g.x, g.z) for g in self.guards])
+
+    def state(self):
+        """Hashable snapshot, for determinism checks."""
+        p = self.player
+        return (self.tick, p.cell, round(p.x, 6), round(p.z, 6), p.score, p.alive, tuple(sorted(self.runes)),
+                tuple((g.state, round(g.x, 6), round(g.z, 6)) for g in self.guards))
+
+def random_walk(rng, hold=15):
+    """Input policy for headless runs: a random direction held for a few ticks."""
+    while True:
+        inputs = Inputs(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), rng.random() < 0.2)
+        for _ in range(hold):
+            yield inputs
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run one 3D-build level headless with a random-walk player.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=5000)
+    parser.add_argument("--los-cache", nargs="?", metavar="DIR", default=LOS_CACHE_DIR,
+                        const=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".los_cache"),
+                        help="keep LOS tables on disk for repeated seeds (default dir: .los_cache)")
+    parser.add_argument("--profile", metavar="TRACE", help="time the tick scopes and dump them (.csv or .json)")
+    args = parser.parse_args()
+    if args.profile:
+        perf.set_enabled(True)
+
+    sim = Simulation(args.seed, args.level, los_cache_dir=args.los_cache)
+    policy = random_walk(random.Random(args.seed))
+    t0 = time.perf_counter()
+    while sim.tick < args.ticks and not sim.over:
+        sim.step(next(policy))
+        perf.end_frame()
+    elapsed = time.perf_counter() - t0
+    outcome = "complete" if sim.complete else ("caught" if not sim.player.alive else "running")
+    print(f"seed {args.seed} level {args.level}: {sim.tick} ticks, {outcome}, score {sim.player.score}, "
+          f"{sim.tick / max(elapsed, 1e-9):.0f} ticks/s")
+    if args.profile:
+        print("trace written to", perf.dump(args.profile))
@@ -1,5 +1,6 @@
 # ui3d.py
 from ursina import Entity, Text, camera, color
+import perf
 
 class HUD:
     def __init__(self):
@@ -13,8 +14,13 @@ class HUD:
                              position=(-.82, .34), scale=(.001, .02), origin=(-.5,0))
 
     def update(self, score, level, stamina):
-        self.score_text.text = f"Score: {int(score)}"
-        self.level_text.text = f"Level: {level}"
+        # assigning Text.text rebuilds its glyph mesh, so only do it on change
+        score_str = f"Score: {int(score)}"
+        if self.score_text.text != score_str:
+            self.score_text.text = score_str
+        level_str = f"Level: {level}"
+        if self.level_text.text != level_str:
+            self.level_text.text = level_str
         # stamina 0..100
         pct = max(0.0, min(1.0, stamina/100.0))
         self.bar_fg.scale_x = .32 * pct
@@ -37,3 +43,34 @@ def show_lore(lines, continue_hint="Press any key to continue..."):
             return
         invoke(waiter, delay=0.02)
     invoke(waiter, delay=0.02)
+
+class PerfOverlay(Entity):
+    """perf.summary() as text in the top-right corner. Its update() runs once
+    per frame, so it also closes each profiled frame; the text is rebuilt
+    every `refresh` frames."""
+    def __init__(self, rows=10, refresh=15):
+        super().__init__(parent=camera.ui)
+        self.rows = rows
+        self.refresh = refresh
+        self.countdown = 0
+        self.text = Text(parent=self, text="", origin=(.5,.5), position=(.87,.47), scale=.8,
+                         font='VeraMono.ttf', color=color.yellow, background=True)
+        self.text.enabled = perf.enabled
+
+    def toggle(self):
+        self.text.enabled = perf.toggle()
+        self.countdown = 0
+
+    def update(self):
+        perf.end_frame()
+        if not perf.enabled:
+            return
+        self.countdown -= 1
+        if self.countdown > 0:
+            return
+        self.countdown = self.refresh
+        lines = [f"{'scope':16s}{'mean':>7s}{'p95':>7s}{'max':>7s}{'calls':>7s}"]
+        for row in perf.summary()[:self.rows]:
+            lines.append(f"{row['scope'][:16]:16s}{row['mean_ms']:7.2f}{row['p95_ms']:7.2f}"
+                         f"{row['max_ms']:7.1f}{row['calls']:7.1f}")
+        self.text.text = "\n".join(lines)
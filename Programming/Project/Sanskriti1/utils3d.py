@@ -1,5 +1,6 @@
 # utils3d.py
 import math
+import os
 import random
 import numpy as np
 from settings3d import TILE_SIZE
@@ -46,6 +47,156 @@ def los_grid(grid, a, b):
             err += dx
     return True
 
+def los_many(grid, cells, targets):
+    """los_grid() from every cell in cells (n x 2 array) to one target cell or to
+    the matching row of targets, walking all Bresenham lines in lockstep.
+    Returns a boolean array."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    targets = np.broadcast_to(np.asarray(targets, dtype=np.int64).reshape(-1, 2), cells.shape)
+    h, w = grid.shape
+    x1, y1 = targets[:, 0], targets[:, 1]
+    x, y = cells[:, 0].copy(), cells[:, 1].copy()
+    dx = np.abs(x1 - x)
+    dy = np.abs(y1 - y)
+    n = 1 + dx + dy
+    x_inc = np.where(x1 > x, 1, -1)
+    y_inc = np.where(y1 > y, 1, -1)
+    error = dx - dy
+    dx *= 2
+    dy *= 2
+    clear = np.ones(len(cells), dtype=bool)
+    for step in range(int(n.max()) if len(cells) else 0):
+        active = step < n
+        clear &= ~(active & (grid[np.clip(y, 0, h - 1), np.clip(x, 0, w - 1)] == 1))
+        step_x = active & (error > 0)
+        step_y = active & (error <= 0)
+        x = np.where(step_x, x + x_inc, x)
+        error = np.where(step_x, error - dy, error)
+        y = np.where(step_y, y + y_inc, y)
+        error = np.where(step_y, error + dx, error)
+    return clear
+
+class LosTable:
+    """Precomputed line of sight between every floor cell and every cell within
+    radius of it, packed as one bitset row per cell. Grids are static during a
+    level, so after the build each query is a single bit lookup; pairs farther
+    apart than radius fall back to los_grid."""
+    def __init__(self, grid, radius=12, bits=None):
+        self.grid = grid
+        self.radius = radius
+        self.span = 2 * radius + 1
+        if bits is None:
+            bits = self._build()
+        self.bits = bits
+        self.stride = bits.shape[1]
+        self.raw = bits.tobytes()  # bytes indexing beats ndarray scalar indexing
+
+    def _build(self):
+        grid, r, span = self.grid, self.radius, self.span
+        h, w = grid.shape
+        oy, ox = np.divmod(np.arange(span * span), span)
+        oy -= r
+        ox -= r
+        keep = ox * ox + oy * oy <= r * r
+        src = np.flatnonzero(grid.ravel() == 0)
+        sx, sy = src % w, src // w
+        # every (floor cell, offset) pair inside the radius and the grid
+        tx = sx[:, None] + ox[None, :]
+        ty = sy[:, None] + oy[None, :]
+        valid = keep[None, :] & (tx >= 0) & (tx < w) & (ty >= 0) & (ty < h)
+        rows, cols = np.nonzero(valid)
+        tx, ty = tx[rows, cols], ty[rows, cols]
+        floor = grid[ty, tx] == 0
+        rows, cols, tx, ty = rows[floor], cols[floor], tx[floor], ty[floor]
+        mask = np.zeros((h * w, span * span), dtype=bool)
+        mask[src[rows], cols] = los_many(grid, np.stack([sx[rows], sy[rows]], axis=1), np.stack([tx, ty], axis=1))
+        return np.packbits(mask, axis=1, bitorder="little")
+
+    @classmethod
+    def load_or_build(cls, grid, seed, level, radius=12, cache_dir=None, max_entries=32):
+        """Reuse a table saved for this seed+level if its grid still matches.
+        The cache keeps at most max_entries tables; the least recently used
+        ones are deleted first."""
+        if cache_dir is None:
+            return cls(grid, radius)
+        path = os.path.join(cache_dir, f"los_{seed}_{level}_{radius}.npz")
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    if np.array_equal(data["grid"], grid):
+                        table = cls(grid, radius, bits=data["bits"])
+                        os.utime(path)  # mark as recently used
+                        return table
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable cache entry: rebuild below
+        table = cls(grid, radius)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(path, grid=grid, bits=table.bits)
+        cls._evict(cache_dir, max_entries)
+        return table
+
+    @staticmethod
+    def _evict(cache_dir, max_entries):
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+                   if name.startswith("los_") and name.endswith(".npz")]
+        if len(entries) <= max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already gone
+
+    def visible(self, a, b):
+        """Same answer as los_grid(grid, a, b)."""
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        r = self.radius
+        if dx * dx + dy * dy > r * r:
+            return los_grid(self.grid, a, b)
+        if self.grid[a[1], a[0]] != 0:
+            return False
+        k = (dy + r) * self.span + dx + r
+        i = a[1] * self.grid.shape[1] + a[0]
+        return bool(self.raw[i * self.stride + (k >> 3)] >> (k & 7) & 1)
+
+    def visible_many(self, cells, target):
+        """Vectorized visible() from each of cells to target."""
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        h, w = self.grid.shape
+        r = self.radius
+        dx = target[0] - cells[:, 0]
+        dy = target[1] - cells[:, 1]
+        near = dx * dx + dy * dy <= r * r
+        k = (dy + r) * self.span + dx + r
+        i = cells[:, 1] * w + cells[:, 0]
+        out = np.zeros(len(cells), dtype=bool)
+        out[near] = (self.bits[i[near], k[near] >> 3] >> (k[near] & 7)) & 1
+        if (~near).any():
+            out[~near] = los_many(self.grid, cells[~near], target)
+        return out
+
+def batch_can_see(grid, cells, positions, headings, fovs, vision, player_cell, player_world, los=None):
+    """Vectorized Guard.can_see_player for many guards.
+       cells: n x 2 grid cells, positions: n x 2 world (x,z), headings/fovs in degrees,
+       vision in tiles, los: optional LosTable. Returns a boolean array.
+    """
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    px, py = player_cell
+    in_range = np.hypot(px - cells[:, 0], py - cells[:, 1]) <= np.asarray(vision)
+    # same yaw convention as angle_to()
+    yaw = np.degrees(np.arctan2(player_world[0] - positions[:, 0], player_world[1] - positions[:, 1])) % 360
+    diff = np.abs((yaw - np.asarray(headings) + 180) % 360 - 180)
+    seen = in_range & (diff <= np.asarray(fovs) / 2)
+    if seen.any():
+        if los is not None:
+            seen[seen] = los.visible_many(cells[seen], player_cell)
+        else:
+            seen[seen] = los_many(grid, cells[seen], player_cell)
+    return seen
+
 def angle_to(a, b):
     """Angle (degrees) from a(x,z) to b(x,z) in XZ plane."""
     ax, az = a